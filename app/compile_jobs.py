@@ -0,0 +1,111 @@
+import threading
+import time
+import uuid
+
+class CompileJob:
+    """One editor's request to compile a document; several jobs can share one compilation"""
+
+    def __init__(self, key, editor_id):
+        self.id = f"{key}-{uuid.uuid4().hex[:12]}"
+        self.key = key
+        self.editor_id = editor_id
+        self.created = time.time()
+        self.status = 'pending'
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+    def finish(self, status, result=None, error=None):
+        if self.done.is_set():
+            return
+        self.status, self.result, self.error = status, result, error
+        self.done.set()
+
+    def to_dict(self):
+        return {'job_id': self.id, 'status': self.status}
+
+class CompileJobs:
+    """Asynchronous LaTeX compilation for the live preview editors.
+
+    `submit` returns a job immediately; `start(latex_string)` must return a
+    Future of the compilation (a RenderResult). Identical documents in flight
+    are compiled once and every job waiting on them gets the result. A new
+    job from the same editor cancels the one it supersedes; the compilation
+    itself is cancelled if nothing else needs it and it has not started.
+    Finished jobs are kept for `ttl` seconds so clients can collect them.
+    """
+
+    def __init__(self, start, ttl=300):
+        self.start = start
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._jobs = {}  # job id -> CompileJob
+        self._inflight = {}  # cache key -> (future, set of job ids waiting for it)
+        self._editors = {}  # editor id -> latest job id
+
+    def submit(self, key, latex_string, editor_id=None):
+        job = CompileJob(key, editor_id)
+        with self._lock:
+            self._prune()
+            if editor_id:
+                previous = self._jobs.get(self._editors.get(editor_id))
+                if previous is not None:
+                    self._cancel(previous)
+                self._editors[editor_id] = job.id
+            self._jobs[job.id] = job
+            if key in self._inflight:
+                self._inflight[key][1].add(job.id)
+                return job
+            future = self.start(latex_string)
+            self._inflight[key] = (future, {job.id})
+        future.add_done_callback(lambda f: self._finish(key, f))
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                self._cancel(job)
+            return job
+
+    def stats(self):
+        with self._lock:
+            return {'jobs': len(self._jobs), 'in_flight': len(self._inflight)}
+
+    def _finish(self, key, future):
+        if future.cancelled():
+            return
+        error = future.exception()
+        result, status = (None, 'failed') if error is not None else (future.result(), 'done')
+        with self._lock:
+            if key not in self._inflight or self._inflight[key][0] is not future:
+                return
+            _, waiting = self._inflight.pop(key)
+            for job_id in waiting:
+                job = self._jobs.get(job_id)
+                if job is not None:
+                    job.finish(status, result, str(error) if error is not None else None)
+
+    def _cancel(self, job):
+        """Cancel a job; the caller holds the lock"""
+        if job.done.is_set():
+            return
+        job.finish('cancelled')
+        inflight = self._inflight.get(job.key)
+        if inflight is not None:
+            future, waiting = inflight
+            waiting.discard(job.id)
+            if not waiting and future.cancel():
+                del self._inflight[job.key]
+
+    def _prune(self):
+        """Forget finished jobs older than the TTL; the caller holds the lock"""
+        cutoff = time.time() - self.ttl
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.done.is_set() and job.created < cutoff]:
+            job = self._jobs.pop(job_id)
+            if self._editors.get(job.editor_id) == job_id:
+                del self._editors[job.editor_id]
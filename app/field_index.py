@@ -0,0 +1,48 @@
+import threading
+from app.repository import clone_item
+
+class FieldIndex:
+    """A copy of a few small fields of every item in a store, in store order.
+
+    Listings and the JSON API read ids, names, ratings and tags from here
+    instead of loading whole items with their content, answers and
+    attachments. Like the other indexes, `sync(version, items)` only copies
+    the items whose fields changed since the last store version.
+    """
+
+    def __init__(self, fields):
+        self.fields = tuple(fields)
+        self._lock = threading.Lock()
+        self._version = None
+        self._items = {}  # item id -> {field: value}, in store order
+
+    @property
+    def version(self):
+        return self._version
+
+    def sync(self, version, items):
+        with self._lock:
+            if version is not None and version == self._version:
+                return
+            projected = {}
+            for item in items:
+                item_id = item.get('id')
+                fields = {field: item[field] for field in self.fields if field in item}
+                previous = self._items.get(item_id)
+                projected[item_id] = previous if previous == fields else clone_item(fields)
+            self._items = projected
+            self._version = version
+
+    def ids(self, predicate=None):
+        """Ids of the items (whose fields match `predicate`, if given), in store order"""
+        with self._lock:
+            return [item_id for item_id, fields in self._items.items() if predicate is None or predicate(fields)]
+
+    def get(self, item_ids):
+        """Private copies of the indexed fields of the given items, skipping unknown ids"""
+        with self._lock:
+            return [clone_item(self._items[item_id]) for item_id in item_ids if item_id in self._items]
+
+    def stats(self):
+        with self._lock:
+            return {'items': len(self._items), 'fields': list(self.fields), 'version': str(self._version)}
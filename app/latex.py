@@ -0,0 +1,404 @@
+import glob
+import hashlib
+import itertools
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from collections import namedtuple
+from xml.sax.saxutils import escape
+from app.locking import file_lock
+from app.sandbox import run_sandboxed, SandboxKilled
+from app.svg_optimize import optimize_svg
+
+# Outcome of one LaTeX compilation: SVG markup (an error SVG on failure), whether it
+# succeeded, a short error description, whether the sandbox had to stop it, and whether
+# the document itself does not compile (so rendering it again would fail the same way)
+RenderResult = namedtuple('RenderResult', ['svg', 'ok', 'error', 'killed', 'permanent'], defaults=(False, False))
+
+get_latex_cache_key = lambda latex_string: hashlib.md5(latex_string.encode('utf-8')).hexdigest()
+
+def create_error_svg(error_message):
+    """Small SVG banner shown in place of a formula that could not be rendered"""
+    return f'''<?xml version="1.0" encoding="UTF-8"?>
+<svg xmlns="http://www.w3.org/2000/svg" width="500" height="100" viewBox="0 0 500 100">
+    <rect width="500" height="100" fill="#f8d7da" stroke="#f5c6cb" stroke-width="1" rx="5" ry="5"/>
+    <text x="50%" y="50%" text-anchor="middle" dominant-baseline="middle" font-family="Arial" font-size="14" fill="#721c24">
+        {escape(error_message)}
+    </text>
+</svg>'''
+
+def create_killed_svg(reason):
+    """Banner for a formula whose render was stopped by the sandbox, distinct from compile errors"""
+    return f'''<?xml version="1.0" encoding="UTF-8"?>
+<svg xmlns="http://www.w3.org/2000/svg" width="500" height="100" viewBox="0 0 500 100">
+    <rect width="500" height="100" fill="#fff3cd" stroke="#ffeeba" stroke-width="1" rx="5" ry="5"/>
+    <text x="50%" y="40%" text-anchor="middle" dominant-baseline="middle" font-family="Arial" font-size="14" fill="#856404">
+        Rendering stopped: too expensive to compile
+    </text>
+    <text x="50%" y="65%" text-anchor="middle" dominant-baseline="middle" font-family="Arial" font-size="12" fill="#856404">
+        {escape(reason)}
+    </text>
+</svg>'''
+
+def split_latex_document(latex_string):
+    """Split a complete document into (preamble, body), or None if it has no document environment"""
+    preamble, begin, rest = latex_string.partition("\\begin{document}")
+    body, end, _ = rest.rpartition("\\end{document}")
+    if not begin or not end:
+        return None
+    return preamble, body
+
+# Files whose change means the installed TeX tree changed: found once per process, stat'ed per use
+_tex_tree_files = None
+
+def tex_tree_signature():
+    """Short hash identifying the installed TeX tree, or None if pdflatex is not available"""
+    global _tex_tree_files
+    if _tex_tree_files is None:
+        try:
+            version = subprocess.run(["pdflatex", "--version"], check=True, stdout=subprocess.PIPE,
+                                     stderr=subprocess.PIPE, text=True, timeout=10).stdout.splitlines()[0]
+            paths = subprocess.run(["kpsewhich", "-all", "ls-R", "pdflatex.fmt"], check=False,
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=10).stdout.split()
+        except (OSError, subprocess.SubprocessError, IndexError):
+            return None
+        _tex_tree_files = (version, paths)
+    version, paths = _tex_tree_files
+    stats = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        stats.append((path, st.st_mtime_ns, st.st_size))
+    return hashlib.md5(repr((version, stats)).encode('utf-8')).hexdigest()[:16]
+
+def get_latex_format(format_folder, preamble, limits=None):
+    """Path (without .fmt) of a precompiled format for a generated preamble, building it if needed.
+
+    Formats live in a subfolder named after the TeX tree signature, so an
+    upgraded TeX installation gets fresh formats and the stale ones are
+    removed. Returns None when no format can be used.
+    """
+    if not format_folder or preamble not in GENERATED_PREAMBLES:
+        return None
+    signature = tex_tree_signature()
+    if signature is None:
+        return None
+    tree_folder = os.path.join(format_folder, signature)
+    name = hashlib.md5(preamble.encode('utf-8')).hexdigest()
+    fmt_file = os.path.join(tree_folder, f"{name}.fmt")
+    failed_file = os.path.join(tree_folder, f"{name}.failed")
+    
+    if not os.path.exists(fmt_file):
+        if os.path.exists(failed_file):
+            return None
+        os.makedirs(tree_folder, exist_ok=True)
+        with file_lock(fmt_file):
+            if not os.path.exists(fmt_file):
+                built = _build_latex_format(preamble, name, fmt_file, limits)
+                if built is False:
+                    # Only a preamble that does not compile fails the same way every time
+                    open(failed_file, "w").close()
+                if not built:
+                    return None
+        _remove_stale_formats(format_folder, signature)
+    return fmt_file[:-len(".fmt")]
+
+def _build_latex_format(preamble, name, fmt_file, limits=None):
+    """Dump the preamble into a format with pdflatex -ini.
+
+    Returns True on success, False if the preamble does not compile, and None
+    if the run failed for a passing reason (timeout, kill, pdflatex missing).
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        tex_file = os.path.join(temp_dir, f"{name}.tex")
+        with open(tex_file, "w") as f:
+            f.write(preamble + "\\dump\n")
+        try:
+            result = run_sandboxed(
+                ["pdflatex", "-ini", "-no-shell-escape", "-interaction=nonstopmode", f"-jobname={name}",
+                 "-output-directory", temp_dir, "&pdflatex", tex_file],
+                limits
+            )
+        except (OSError, SandboxKilled):
+            return None
+        if result.returncode < 0:  # Stopped by a signal
+            return None
+        built = os.path.join(temp_dir, f"{name}.fmt")
+        if result.returncode != 0 or not os.path.exists(built):
+            return False
+        shutil.move(built, f"{fmt_file}.tmp")
+        os.replace(f"{fmt_file}.tmp", fmt_file)
+        return True
+
+def _remove_stale_formats(format_folder, signature):
+    for entry in os.listdir(format_folder):
+        if entry != signature:
+            shutil.rmtree(os.path.join(format_folder, entry), ignore_errors=True)
+
+def _run_pdflatex(temp_dir, source, name, fmt=None, limits=None, timeout_scale=1):
+    tex_file = os.path.join(temp_dir, f"{name}.tex")
+    with open(tex_file, "w") as f:
+        f.write(source + "\n\n")
+    
+    # Shell escape lets a document run arbitrary commands, so it is opt-in
+    shell_escape = "-shell-escape" if limits and limits.shell_escape else "-no-shell-escape"
+    command = ["pdflatex", shell_escape, "-interaction=nonstopmode", "-output-directory", temp_dir]
+    if fmt:
+        command.append(f"-fmt={fmt}")
+    result = run_sandboxed(command + [tex_file], limits, timeout_scale)
+    pdf_file = os.path.join(temp_dir, f"{name}.pdf")
+    if result.returncode < 0:
+        # Killed from outside rather than failing on the document: not a compile error
+        raise RuntimeError(f"pdflatex stopped by signal {-result.returncode}")
+    if result.returncode != 0:
+        return None, "LaTeX compilation failed"
+    if not os.path.exists(pdf_file):
+        return None, "PDF file was not created"
+    return pdf_file, None
+
+def _compile_pdf(temp_dir, latex_string, name="content", format_folder=None, limits=None, timeout_scale=1):
+    """Run pdflatex on a document in temp_dir; returns (pdf_path, None) or (None, error message).
+
+    Documents with a generated preamble are compiled against its precompiled
+    format, falling back to a full compile if that fails. Raises
+    SandboxKilled if pdflatex exceeds its limits, and RuntimeError if another
+    signal stops it; (None, message) always means the document failed to compile.
+    """
+    parts = split_latex_document(latex_string)
+    fmt = get_latex_format(format_folder, parts[0], limits) if parts else None
+    if fmt:
+        pdf_file, message = _run_pdflatex(temp_dir, "\\begin{document}" + parts[1] + "\\end{document}",
+                                          name, fmt, limits, timeout_scale)
+        if pdf_file:
+            return pdf_file, None
+    return _run_pdflatex(temp_dir, latex_string, name, limits=limits, timeout_scale=timeout_scale)
+
+def _run_pdf2svg(command, limits=None, timeout_scale=1):
+    if run_sandboxed(command, limits, timeout_scale).returncode != 0:
+        raise RuntimeError("SVG conversion failed")
+
+def render_latex(latex_string, format_folder=None, limits=None):
+    """Compile a complete LaTeX document to SVG markup with pdflatex and pdf2svg, without caching.
+
+    Both commands run in the sandbox with `limits` (app.sandbox.DEFAULT_LIMITS if None).
+    """
+    error = lambda message, permanent=False: RenderResult(create_error_svg(message), False, message, permanent=permanent)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        try:
+            pdf_file, message = _compile_pdf(temp_dir, latex_string, format_folder=format_folder, limits=limits)
+            if pdf_file is None:
+                return error(message, permanent=True)
+            
+            # Convert PDF to SVG
+            svg_file = os.path.join(temp_dir, "content.svg")
+            _run_pdf2svg(["pdf2svg", pdf_file, svg_file], limits)
+            with open(svg_file, "r") as f:
+                return RenderResult(optimize_svg(f.read()), True, None)
+            
+        except SandboxKilled as e:
+            return RenderResult(create_killed_svg(e.reason), False, str(e), True)
+        except Exception as e:
+            return error(f"Error: {str(e)}")
+
+# Reset between pages of a batch so numbering matches a document compiled on its own
+BATCH_PAGE_RESET = r"""
+\makeatletter
+\newcommand{\batchpagereset}{\setcounter{page}{1}\setcounter{equation}{0}\@ifundefined{c@question}{}{\setcounter{question}{0}}}
+\makeatother
+"""
+
+# Anything that can start a new page, which would split a whole-document preview
+PAGE_BREAKS = re.compile(r"\\(newpage|clearpage|cleardoublepage|pagebreak)\b|\\begin\{(figure|table)\*?\}")
+
+def renders_one_preview_page(preamble, body):
+    """Whether a document's body becomes exactly one page of a batch.
+
+    A previewed environment must be used once in the body. Documents
+    previewing the whole document (plain-math questions) qualify as long as
+    nothing in the body can break the page.
+    """
+    match = re.search(r"\\PreviewEnvironment\{([^}]*)\}", preamble)
+    if not match:
+        return False
+    if match.group(1) == "document":
+        return not PAGE_BREAKS.search(body)
+    return body.count("\\begin{" + match.group(1) + "}") == 1
+
+def group_render_batches(keys, latex_strings, batch_size):
+    """Split document keys into render batches of up to `batch_size`; documents that cannot share a batch get their own"""
+    batchable, alone = [], []
+    for key in keys:
+        parts = split_latex_document(latex_strings[key])
+        (batchable if parts and renders_one_preview_page(*parts) else alone).append(key)
+    return [batchable[i:i + batch_size] for i in range(0, len(batchable), batch_size)] + [[key] for key in alone]
+
+def render_latex_batch(latex_strings, format_folder=None, limits=None):
+    """Compile several complete LaTeX documents, returning one RenderResult per document in order.
+
+    Documents sharing a preamble are compiled together as one multi-page
+    PDF, one page per document, and split with pdf2svg's page selection, so
+    a batch costs one pdflatex run instead of one per document. Only
+    documents that produce exactly one preview page are batched (see
+    renders_one_preview_page); the rest are rendered on their own. If a batch
+    fails or does not produce exactly one page per document, it is halved
+    and retried, which isolates a broken document down to a single render.
+    """
+    results = [None] * len(latex_strings)
+    groups = {}
+    for index, latex_string in enumerate(latex_strings):
+        parts = split_latex_document(latex_string)
+        if parts is None or not renders_one_preview_page(*parts):
+            results[index] = render_latex(latex_string, format_folder, limits)
+        else:
+            groups.setdefault(parts[0], []).append((index, parts[1]))
+    
+    for preamble, members in groups.items():
+        _render_batch_group(preamble, members, latex_strings, results, format_folder, limits)
+    return results
+
+def _render_batch_group(preamble, members, latex_strings, results, format_folder, limits):
+    if len(members) == 1:
+        index = members[0][0]
+        results[index] = render_latex(latex_strings[index], format_folder, limits)
+        return
+    
+    try:
+        pages = _render_pages(preamble, [body for _, body in members], format_folder, limits)
+    except SandboxKilled:
+        # Halving would spend the time limit again at every level; one runaway document only costs its own run
+        for index, _ in members:
+            results[index] = render_latex(latex_strings[index], format_folder, limits)
+        return
+    if pages is None:
+        middle = len(members) // 2
+        _render_batch_group(preamble, members[:middle], latex_strings, results, format_folder, limits)
+        _render_batch_group(preamble, members[middle:], latex_strings, results, format_folder, limits)
+        return
+    for (index, _), svg in zip(members, pages):
+        results[index] = RenderResult(svg, True, None)
+
+# A batch gets more time than one document, but not enough to hide a runaway one for long
+BATCH_MAX_TIMEOUT_SCALE = 4
+
+def _render_pages(preamble, bodies, format_folder, limits):
+    """Render bodies as consecutive pages of one document; None if it fails or the pages don't line up.
+
+    Raises SandboxKilled if the batch exceeds its limits.
+    """
+    # Previewing the whole document would crop the batch into a single page, so
+    # each body gets its own preview environment instead
+    whole_document = re.search(r"\\PreviewEnvironment\{document\}\n*", preamble)
+    if whole_document:
+        preamble = preamble[:whole_document.start()] + preamble[whole_document.end():]
+    # The reset macro is defined after \begin{document} so the preamble still matches its format
+    document = preamble + "\\begin{document}\n" + BATCH_PAGE_RESET
+    for body in bodies:
+        if whole_document:
+            body = "\\begin{preview}" + body + "\\end{preview}"
+        # Each document is grouped so local definitions don't leak into the next page
+        document += "\\batchpagereset\n\\begingroup\n" + body + "\n\\endgroup\n\\clearpage\n"
+    document += "\\end{document}"
+    
+    with tempfile.TemporaryDirectory() as temp_dir:
+        timeout_scale = min(len(bodies), BATCH_MAX_TIMEOUT_SCALE)
+        try:
+            pdf_file, _ = _compile_pdf(temp_dir, document, name="batch", format_folder=format_folder,
+                                       limits=limits, timeout_scale=timeout_scale)
+            if pdf_file is None:
+                return None
+            _run_pdf2svg(["pdf2svg", pdf_file, os.path.join(temp_dir, "page-%d.svg"), "all"], limits, timeout_scale)
+        except SandboxKilled:
+            raise
+        except Exception:
+            return None
+        
+        page_files = sorted(glob.glob(os.path.join(temp_dir, "page-*.svg")),
+                            key=lambda path: int(re.search(r"page-(\d+)\.svg$", path).group(1)))
+        if len(page_files) != len(bodies):
+            return None
+        pages = []
+        for page_file in page_files:
+            with open(page_file, "r") as f:
+                pages.append(optimize_svg(f.read()))
+        return pages
+
+def build_latex_preamble(tikz=False, circuitikz=False, enumitem=False, preview_env="document"):
+    """Preamble used by ensure_complete_latex_document, up to (not including) \\begin{document}"""
+    packages = ["\\usepackage{amsmath}", "\\usepackage{amssymb}"]
+    
+    # Add tikz package if needed
+    if tikz:
+        packages.append("\\usepackage{tikz}")
+    
+    # Add circuitikz package if needed
+    if circuitikz:
+        packages.append("\\usepackage{circuitikz}")
+    
+    # Add enumitem if enumerate is used with custom labels
+    if enumitem:
+        packages.append("\\usepackage{enumitem}")
+        
+    # Add geometry package for better margins
+    packages.append("\\usepackage{geometry}")
+    packages.append("\\geometry{margin=1in}")
+    
+    # Add preview package for cropping white space
+    packages.append("\\usepackage[active,tightpage]{preview}")
+    
+    # Create a complete document using exam document class
+    preamble = "\\documentclass{exam}\n"
+    preamble += "\n".join(packages) + "\n\n"
+    if preview_env:
+        preamble += f"\\PreviewEnvironment{{{preview_env}}}\n\n"
+    return preamble
+
+# Every preamble ensure_complete_latex_document can produce; these get precompiled formats
+GENERATED_PREAMBLES = frozenset(
+    build_latex_preamble(*flags, preview_env=preview_env)
+    for flags in itertools.product((False, True), repeat=3)
+    # None is the preamble a whole-document batch compiles with (see _render_pages)
+    for preview_env in ("document", "questions", "tikzpicture", "circuitikz", None)
+)
+
+def ensure_complete_latex_document(latex_content):
+    """Makes sure the LaTeX content is a complete document by adding preamble and document environment if needed."""
+    # Check if it's already a complete document
+    if "\\documentclass" in latex_content:
+        return latex_content
+    
+    # Add preview environment based on what's in the content
+    preview_env = "document"  # Default to previewing the whole document
+    
+    # Check for specific environments to preview
+    if "\\begin{questions}" in latex_content:
+        preview_env = "questions"
+    elif "\\begin{tikzpicture}" in latex_content:
+        preview_env = "tikzpicture"
+    elif "\\begin{circuitikz}" in latex_content:
+        preview_env = "circuitikz"
+    
+    # Detect what environments are present to add appropriate packages
+    complete_document = build_latex_preamble(
+        tikz="\\begin{tikzpicture}" in latex_content,
+        circuitikz="\\begin{circuitikz}" in latex_content,
+        enumitem="\\begin{enumerate}" in latex_content,
+        preview_env=preview_env,
+    )
+    complete_document += "\\begin{document}\n\n"
+    
+    # For plain math expressions, wrap in questions environment to benefit from preview
+    if not any(env in latex_content for env in ["\\begin{questions}", "\\begin{tikzpicture}", "\\begin{circuitikz}"]):
+        complete_document += "\\begin{questions}\n\\question\n"
+        complete_document += latex_content + "\n"
+        complete_document += "\\end{questions}\n"
+    else:
+        complete_document += latex_content + "\n\n"
+        
+    complete_document += "\\end{document}"
+    
+    return complete_document
@@ -0,0 +1,102 @@
+import os
+import stat
+import tempfile
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads within this process are serialised
+    fcntl = None
+
+# Locks held by the current thread: lock path -> [fd or RLock, depth, exclusive]
+_held = threading.local()
+_process_locks = {}
+_process_locks_guard = threading.Lock()
+
+def _process_lock(lock_path):
+    with _process_locks_guard:
+        return _process_locks.setdefault(lock_path, threading.RLock())
+
+@contextmanager
+def file_lock(path, shared=False):
+    """Advisory lock on `<path>.lock`, shared between processes and threads.
+
+    Re-entrant within a thread, so helpers that lock can call each other.
+    An exclusive request made while holding a shared lock upgrades it.
+    """
+    lock_path = f"{path}.lock"
+    held = getattr(_held, 'locks', None)
+    if held is None:
+        held = _held.locks = {}
+
+    entry = held.get(lock_path)
+    if entry is not None:
+        if fcntl and not shared and not entry[2]:
+            fcntl.flock(entry[0], fcntl.LOCK_EX)
+            entry[2] = True
+        entry[1] += 1
+        try:
+            yield
+        finally:
+            entry[1] -= 1
+        return
+
+    if fcntl:
+        os.makedirs(os.path.dirname(lock_path) or '.', exist_ok=True)
+        handle = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(handle, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        except BaseException:
+            os.close(handle)
+            raise
+    else:
+        handle = _process_lock(lock_path)
+        handle.acquire()
+
+    held[lock_path] = [handle, 1, not shared]
+    try:
+        yield
+    finally:
+        del held[lock_path]
+        if fcntl:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+            os.close(handle)
+        else:
+            handle.release()
+
+def atomic_write(path, write, mode='w'):
+    """Write a file via a temp file in the same directory and an atomic rename.
+
+    `write` receives the open temp file. Readers see either the old or the
+    new contents, never a truncated file.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode) as f:
+            # mkstemp creates 0600 files; keep the permissions of the file being replaced
+            os.chmod(tmp_path, stat.S_IMODE(os.stat(path).st_mode) if os.path.exists(path) else 0o644)
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    _fsync_directory(directory)
+
+def _fsync_directory(directory):
+    """Persist the rename itself; not supported on every platform"""
+    try:
+        dir_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(dir_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(dir_fd)
@@ -0,0 +1,34 @@
+import base64
+import json
+
+def encode_cursor(key):
+    """Turn the sort key of the last item on a page into an opaque URL-safe cursor"""
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """Return the sort key stored in a cursor, or None if it is not one"""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        return None
+    return tuple(key) if isinstance(key, list) else None
+
+def paginate(items, key, cursor=None, page_size=20, reverse=False):
+    """Return (page, next_cursor) for items already sorted by `key` (descending if `reverse`).
+
+    The cursor holds the sort key of the last item shown, not an offset, so
+    the next page starts right after it even if items were added or removed
+    in between. Keys must be unique, e.g. end with the item id. An invalid
+    cursor starts from the first page; next_cursor is None on the last page.
+    """
+    start = 0
+    after = decode_cursor(cursor) if cursor else None
+    if after is not None:
+        try:
+            start = next((index for index, item in enumerate(items) if (key(item) < after if reverse else key(item) > after)),
+                         len(items))
+        except TypeError:
+            start = 0
+    page = items[start:start + page_size]
+    next_cursor = encode_cursor(key(page[-1])) if page and start + page_size < len(items) else None
+    return page, next_cursor
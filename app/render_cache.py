@@ -0,0 +1,271 @@
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+# A render that failed: its error SVG, whether the document itself does not compile, and when to try again (None: never)
+RenderFailure = namedtuple('RenderFailure', 'svg error permanent retry_at')
+
+# Shared caches, one per database path
+_caches = {}
+_caches_lock = threading.Lock()
+
+class RenderCache:
+    """Durable LaTeX render cache shared by every worker process.
+
+    Rendered SVG markup is kept in an SQLite database keyed by the LaTeX
+    cache key of the complete document, so it survives restarts and is
+    shared between workers. The total size is bounded: when it exceeds
+    `max_bytes`, the least recently used entries are evicted. Failed renders
+    are kept apart from the entries, so pages can show the error instead of
+    compiling the same document again on every view.
+
+    Lookups only read the database. Hit and miss counts, and the recency of
+    hit entries, are collected in the process and written in one
+    transaction every FLUSH_INTERVAL seconds or with the next put, so
+    cache hits never wait for the write lock.
+    """
+
+    # Seconds between writes of the lookups counted in this process
+    FLUSH_INTERVAL = 5.0
+    # A hit only refreshes an entry's last_used once it is older than this, in seconds
+    TOUCH_INTERVAL = 60.0
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY, svg TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL);
+        CREATE INDEX IF NOT EXISTS idx_entries_last_used ON entries(last_used);
+        CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        CREATE TABLE IF NOT EXISTS failures (
+            key TEXT PRIMARY KEY, svg TEXT NOT NULL, error TEXT, permanent INTEGER NOT NULL,
+            attempts INTEGER NOT NULL, retry_at REAL);
+    """
+    COUNTERS = ('hits', 'misses', 'evictions', 'bytes', 'killed')
+
+    def __init__(self, database, max_bytes):
+        self.database = database
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._pending_lock = threading.Lock()
+        self._pending = {'hits': 0, 'misses': 0}
+        self._touched = {}  # key -> time of a hit not yet written to last_used
+        self._flushed_at = time.time()
+        os.makedirs(os.path.dirname(database), exist_ok=True)
+        conn = self.connection()
+        conn.executescript(self.SCHEMA)
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO counters (name, value) VALUES (?, 0)", [(name,) for name in self.COUNTERS])
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.database, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _count(self, conn, name, amount=1):
+        conn.execute("UPDATE counters SET value = value + ? WHERE name = ?", (amount, name))
+
+    def count_killed(self):
+        """Record a render the sandbox had to stop (shared by all workers, like the other counters)"""
+        conn = self.connection()
+        with conn:
+            self._count(conn, 'killed')
+
+    def get(self, key):
+        """Return cached SVG markup for a key, or None; a hit marks the entry as recently used"""
+        row = self.connection().execute("SELECT svg, last_used FROM entries WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        with self._pending_lock:
+            if row is None:
+                self._pending['misses'] += 1
+            else:
+                self._pending['hits'] += 1
+                if row[1] < now - self.TOUCH_INTERVAL:
+                    self._touched[key] = now
+            due = now - self._flushed_at >= self.FLUSH_INTERVAL
+        if due:
+            self.flush()
+        return row[0] if row is not None else None
+
+    def _take_pending(self):
+        with self._pending_lock:
+            pending, touched = self._pending, self._touched
+            self._pending, self._touched = {'hits': 0, 'misses': 0}, {}
+            self._flushed_at = time.time()
+        return pending, touched
+
+    def _write_pending(self, conn, pending, touched):
+        for name, amount in pending.items():
+            if amount:
+                self._count(conn, name, amount)
+        conn.executemany("UPDATE entries SET last_used = MAX(last_used, ?) WHERE key = ?",
+                         [(used, key) for key, used in touched.items()])
+
+    def flush(self):
+        """Write the lookups counted in this process since the last flush"""
+        pending, touched = self._take_pending()
+        if any(pending.values()) or touched:
+            conn = self.connection()
+            with conn:
+                self._write_pending(conn, pending, touched)
+
+    def put(self, key, svg):
+        """Store SVG markup, then evict least recently used entries until within the size budget"""
+        size = len(svg.encode('utf-8'))
+        conn = self.connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            # Recent hits count before choosing what to evict
+            self._write_pending(conn, *self._take_pending())
+            old = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            conn.execute("INSERT OR REPLACE INTO entries (key, svg, size, last_used) VALUES (?, ?, ?, ?)",
+                         (key, svg, size, time.time()))
+            conn.execute("DELETE FROM failures WHERE key = ?", (key,))
+            self._count(conn, 'bytes', size - (old[0] if old else 0))
+            total = conn.execute("SELECT value FROM counters WHERE name = 'bytes'").fetchone()[0]
+            if total > self.max_bytes:
+                self._evict(conn, total - self.max_bytes, keep=key)
+
+    def get_failure(self, key):
+        """The recorded failure of a key's last render, or None"""
+        row = self.connection().execute("SELECT svg, error, permanent, retry_at FROM failures WHERE key = ?", (key,)).fetchone()
+        return RenderFailure(row[0], row[1], bool(row[2]), row[3]) if row else None
+
+    def put_failure(self, key, svg, error, permanent, retry_delay, max_retry_delay):
+        """Record a failed render. Documents that do not compile are not retried; other failures
+        (stopped or crashed runs) may be retried after retry_delay, doubling with each failure."""
+        conn = self.connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute("SELECT attempts FROM failures WHERE key = ?", (key,)).fetchone()
+            attempts = (row[0] if row else 0) + 1
+            retry_at = None if permanent else time.time() + min(retry_delay * 2 ** (attempts - 1), max_retry_delay)
+            conn.execute("INSERT OR REPLACE INTO failures (key, svg, error, permanent, attempts, retry_at) "
+                         "VALUES (?, ?, ?, ?, ?, ?)", (key, svg, error, int(permanent), attempts, retry_at))
+
+    def _evict(self, conn, excess, keep):
+        freed = evicted = 0
+        while freed < excess:
+            rows = conn.execute("SELECT key, size FROM entries WHERE key != ? ORDER BY last_used LIMIT 64", (keep,)).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if freed >= excess:
+                    break
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                freed += size
+                evicted += 1
+        self._count(conn, 'bytes', -freed)
+        self._count(conn, 'evictions', evicted)
+
+    def stats(self):
+        self.flush()
+        conn = self.connection()
+        counters = dict(conn.execute("SELECT name, value FROM counters"))
+        entries = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        failures = conn.execute("SELECT COUNT(*), COALESCE(SUM(permanent), 0) FROM failures").fetchone()
+        lookups = counters['hits'] + counters['misses']
+        return {
+            'entries': entries,
+            'bytes': counters['bytes'],
+            'max_bytes': self.max_bytes,
+            'hits': counters['hits'],
+            'misses': counters['misses'],
+            'evictions': counters['evictions'],
+            'killed_renders': counters['killed'],
+            'failed_documents': failures[1],
+            'failures_awaiting_retry': failures[0] - failures[1],
+            'hit_ratio': counters['hits'] / lookups if lookups else 0.0,
+        }
+
+class MemoryRenderCache:
+    """Per-process LRU cache of rendered SVG markup with a byte budget and a TTL.
+
+    get and put are O(1). Expired entries are dropped when they are looked
+    up or when they reach the least recently used end during a put, so
+    expiry never needs a full scan.
+    """
+
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (svg, size, expires), least recently used first
+        self._bytes = 0
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, svg):
+        size = len(svg.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (svg, size, now + self.ttl)
+            self._bytes += size
+            # Oldest entries first: drop expired ones, then evict while over budget
+            while self._entries:
+                oldest, (_, _, expires) = next(iter(self._entries.items()))
+                if expires <= now:
+                    self.expirations += 1
+                elif self._bytes > self.max_bytes:
+                    self.evictions += 1
+                else:
+                    break
+                self._remove(oldest)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
+
+def get_render_cache(database, max_bytes):
+    """Return the shared render cache for a database path"""
+    with _caches_lock:
+        cache = _caches.get(database)
+        if cache is None:
+            cache = _caches[database] = RenderCache(database, max_bytes)
+        return cache
+
+@atexit.register
+def _flush_all_caches():
+    for cache in list(_caches.values()):
+        cache.flush()
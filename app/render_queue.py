@@ -0,0 +1,240 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from app.latex import render_latex, render_latex_batch, group_render_batches, create_error_svg, RenderResult
+
+logger = logging.getLogger(__name__)
+
+# Priority classes: previews an author is waiting for, and background question renders
+INTERACTIVE = 'interactive'
+BATCH = 'batch'
+
+class RenderScheduler:
+    """Priority dispatch of render jobs onto one pool of worker processes.
+
+    Jobs wait in one FIFO queue per priority class and are only handed to the
+    pool when a worker is free, so a burst of batch work never sits in front
+    of an interactive job inside the pool. Free workers are shared by
+    weighted round robin (`weights`), and `reserved` workers are kept for
+    interactive jobs only, so previews keep a flat latency while a full
+    re-render is running.
+    """
+
+    def __init__(self, max_workers, reserved=1, weights=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        # With a single worker nothing can be reserved without starving batch jobs
+        self.reserved = max(0, min(reserved, self.max_workers - 1))
+        self.weights = weights or {INTERACTIVE: 4, BATCH: 1}
+        # Re-entrant: futures failed while dispatching run their callbacks, which may submit again
+        self._lock = threading.RLock()
+        self._executor = None
+        self._queues = {priority: deque() for priority in self.weights}
+        self._running = {priority: 0 for priority in self.weights}
+        self._credits = dict(self.weights)
+        self._metrics = {priority: {'submitted': 0, 'started': 0, 'completed': 0, 'cancelled': 0,
+                                    'wait_total': 0.0, 'wait_max': 0.0, 'recent_waits': deque(maxlen=200)}
+                         for priority in self.weights}
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def _replace_broken_executor(self, executor):
+        """Drop a pool whose worker died so the next job starts a fresh one; the caller holds the lock"""
+        if self._executor is executor:
+            logger.warning("Render worker pool broken, starting a new one")
+            executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def submit(self, priority, fn, *args):
+        """Queue fn(*args) in a priority class; returns a Future that can be cancelled until it starts"""
+        future = Future()
+        with self._lock:
+            self._queues[priority].append((future, time.monotonic(), fn, args))
+            self._metrics[priority]['submitted'] += 1
+            self._dispatch()
+        return future
+
+    def _next_priority(self):
+        """Weighted round robin over the classes with queued jobs allowed to take a free worker"""
+        running = sum(self._running.values())
+        eligible = [priority for priority, queue in self._queues.items()
+                    if queue and (priority == INTERACTIVE or running < self.max_workers - self.reserved)]
+        if not eligible:
+            return None
+        if all(self._credits[priority] <= 0 for priority in eligible):
+            self._credits = dict(self.weights)
+        return max(eligible, key=lambda priority: self._credits[priority])
+
+    def _dispatch(self):
+        """Start queued jobs while workers are free; the caller holds the lock"""
+        while sum(self._running.values()) < self.max_workers:
+            priority = self._next_priority()
+            if priority is None:
+                return
+            future, queued_at, fn, args = self._queues[priority].popleft()
+            metrics = self._metrics[priority]
+            if not future.set_running_or_notify_cancel():
+                metrics['cancelled'] += 1
+                continue
+            self._credits[priority] -= 1
+            wait = time.monotonic() - queued_at
+            metrics['started'] += 1
+            metrics['wait_total'] += wait
+            metrics['wait_max'] = max(metrics['wait_max'], wait)
+            metrics['recent_waits'].append(wait)
+            self._running[priority] += 1
+            try:
+                executor = self._get_executor()
+                try:
+                    work = executor.submit(fn, *args)
+                except BrokenProcessPool:
+                    # A worker died since the last job; the job did not run, so start it on a new pool
+                    self._replace_broken_executor(executor)
+                    executor = self._get_executor()
+                    work = executor.submit(fn, *args)
+            except Exception as e:
+                self._running[priority] -= 1
+                future.set_exception(e)
+                continue
+            work.add_done_callback(lambda work, future=future, priority=priority, executor=executor:
+                                   self._finish(future, priority, work, executor))
+
+    def _finish(self, future, priority, work, executor):
+        with self._lock:
+            if not work.cancelled() and isinstance(work.exception(), BrokenProcessPool):
+                self._replace_broken_executor(executor)
+            self._running[priority] -= 1
+            self._metrics[priority]['completed'] += 1
+            self._dispatch()
+        if work.cancelled():
+            future.set_exception(RuntimeError("Render worker pool shut down"))
+        elif work.exception() is not None:
+            future.set_exception(work.exception())
+        else:
+            future.set_result(work.result())
+
+    def stats(self):
+        with self._lock:
+            stats = {'workers': self.max_workers, 'reserved_interactive': self.reserved}
+            for priority, metrics in self._metrics.items():
+                waits = sorted(metrics['recent_waits'])
+                stats[priority] = {
+                    'queued': len(self._queues[priority]),
+                    'running': self._running[priority],
+                    'submitted': metrics['submitted'],
+                    'completed': metrics['completed'],
+                    'cancelled': metrics['cancelled'],
+                    'wait_avg': metrics['wait_total'] / metrics['started'] if metrics['started'] else 0.0,
+                    'wait_max': metrics['wait_max'],
+                    'wait_p95_recent': waits[int(len(waits) * 0.95)] if waits else 0.0,
+                }
+            return stats
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+class RenderQueue:
+    """Renders question LaTeX documents as batch jobs on a RenderScheduler, off the request path.
+
+    Jobs are keyed by the LaTeX cache key, so a document requested by several
+    questions (or several page views) is only compiled once. When a job
+    finishes, `on_done(key, owner_ids, result)` is called from a pool thread
+    with every owner (question id) that asked for it.
+
+    Documents submitted together are compiled in batches of up to
+    `batch_size` per pdflatex run (see `render_latex_batch`), against the
+    precompiled formats kept in `format_folder`, inside the sandbox `limits`.
+    """
+
+    def __init__(self, scheduler, on_done, batch_size=16, format_folder=None, limits=None):
+        self.scheduler = scheduler
+        self.on_done = on_done
+        self.batch_size = max(1, batch_size)
+        self.format_folder = format_folder
+        self.limits = limits
+        self._lock = threading.Lock()
+        self._owners = {}  # cache key -> set of owner ids waiting for it
+        self._owner_keys = {}  # owner id -> cache key being rendered for it
+
+    def submit(self, key, latex_string, owner_id):
+        """Queue a render unless the same document is already queued; returns True if a new job started"""
+        return self.submit_many([(key, latex_string, owner_id)]) > 0
+
+    def submit_many(self, jobs):
+        """Queue (key, latex_string, owner_id) jobs, batching new documents; returns the number of new documents"""
+        new_jobs = {}
+        with self._lock:
+            for key, latex_string, owner_id in jobs:
+                self._owner_keys[owner_id] = key
+                if key in self._owners:
+                    self._owners[key].add(owner_id)
+                    continue
+                self._owners[key] = {owner_id}
+                new_jobs[key] = latex_string
+        keys = list(new_jobs)
+        # Spread work over the pool instead of giving one worker everything
+        size = min(self.batch_size, max(1, -(-len(keys) // self.scheduler.max_workers)))
+        for batch in group_render_batches(keys, new_jobs, size):
+            if len(batch) == 1:
+                future = self.scheduler.submit(BATCH, render_latex, new_jobs[batch[0]], self.format_folder, self.limits)
+            else:
+                future = self.scheduler.submit(BATCH, render_latex_batch, [new_jobs[key] for key in batch],
+                                               self.format_folder, self.limits)
+            future.add_done_callback(lambda f, batch=batch: self._finish(batch, f))
+        return len(keys)
+
+    def is_pending(self, owner_id):
+        with self._lock:
+            return owner_id in self._owner_keys
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._owners)
+
+    def _finish(self, keys, future):
+        results = None
+        if not future.cancelled():
+            error = future.exception()
+            if error is not None:
+                logger.error(f"Background LaTeX render failed: {error}")
+                # Reported like a stopped render, so the documents are retried later instead of on every view
+                results = [RenderResult(create_error_svg("Rendering failed"), False, str(error))] * len(keys)
+            else:
+                results = future.result()
+                if len(keys) == 1:
+                    results = [results]
+        for index, key in enumerate(keys):
+            with self._lock:
+                owner_ids = self._owners.pop(key, set())
+            try:
+                if results is not None:
+                    self.on_done(key, owner_ids, results[index])
+            except Exception:
+                logger.exception("Error storing background LaTeX render")
+            finally:
+                with self._lock:
+                    for owner_id in owner_ids:
+                        if self._owner_keys.get(owner_id) == key:
+                            del self._owner_keys[owner_id]
+
+# Schedulers created in this process, shut down at exit
+_schedulers = []
+
+def create_render_scheduler(max_workers, reserved=1, weights=None):
+    scheduler = RenderScheduler(max_workers, reserved, weights)
+    _schedulers.append(scheduler)
+    return scheduler
+
+@atexit.register
+def _shutdown_schedulers():
+    for scheduler in _schedulers:
+        scheduler.shutdown()
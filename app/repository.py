@@ -0,0 +1,94 @@
+import json
+import os
+import threading
+from decimal import Decimal
+
+# Shared in-memory repositories, one per data file
+_repositories = {}
+_repositories_lock = threading.Lock()
+
+def clone_item(value):
+    """Copy a JSON-like value so callers can mutate it without touching the cache"""
+    if isinstance(value, dict):
+        return {k: clone_item(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [clone_item(v) for v in value]
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+def file_signature(file_path):
+    """Return (inode, mtime_ns, size) for a file, or None if it does not exist"""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+class JsonRepository:
+    """Parsed, id-indexed contents of one JSON data file.
+
+    The file is only re-parsed when it is replaced or its mtime or size changes, so repeated
+    loads and id lookups within and across requests are served from memory.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._lock = threading.Lock()
+        self._signature = None
+        self._items = []
+        self._index = {}
+
+    def _refresh(self):
+        """Reload the file if it changed on disk since the last parse"""
+        signature = file_signature(self.file_path)
+        if signature == self._signature:
+            return
+        if signature is None:
+            items = []
+        else:
+            with open(self.file_path, 'r') as f:
+                items = json.load(f)
+        self._set_items(items, signature)
+
+    def _set_items(self, items, signature):
+        self._items = items
+        self._index = {item.get('id'): item for item in items if isinstance(item, dict) and 'id' in item}
+        self._signature = signature
+
+    def exists(self):
+        with self._lock:
+            self._refresh()
+            return self._signature is not None
+
+    def all(self):
+        """Return a private copy of every item in file order"""
+        with self._lock:
+            self._refresh()
+            return clone_item(self._items)
+
+    def snapshot(self):
+        """Return (signature, items) from the same parse, for optimistic version checks"""
+        with self._lock:
+            self._refresh()
+            return self._signature, clone_item(self._items)
+
+    def get(self, item_id):
+        """Return a private copy of the item with the given id, or None"""
+        with self._lock:
+            self._refresh()
+            item = self._index.get(item_id)
+            return clone_item(item) if item is not None else None
+
+    def replace(self, items):
+        """Record data that was just written to the file, avoiding a re-parse"""
+        with self._lock:
+            self._set_items(clone_item(items), file_signature(self.file_path))
+
+def get_repository(file_path):
+    """Return the shared repository for a data file"""
+    with _repositories_lock:
+        repository = _repositories.get(file_path)
+        if repository is None:
+            repository = _repositories[file_path] = JsonRepository(file_path)
+        return repository
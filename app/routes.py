@@ -1,102 +1,243 @@
+import functools
+import hashlib
 import json
 import os
 import re
-import tempfile
-import subprocess
 import shutil
-import hashlib
-from flask import render_template, request, redirect, url_for, jsonify, flash, session, send_from_directory
+from urllib.parse import urlencode
+from flask import render_template, request, redirect, url_for, jsonify, flash, session, send_from_directory, send_file, Response, abort, g, make_response, has_request_context
+from werkzeug.http import is_resource_modified
 from werkzeug.utils import secure_filename
 from app import app
 from app.forms import QuestionForm, AttachmentForm
 import uuid
-from decimal import Decimal
-import base64
 import time
 import mimetypes
 from app.data_loader import load_user_data, filter_data_by_timerange
-
-# Custom JSON encoder to handle Decimal objects
-class DecimalEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, Decimal):
-            return float(obj)
-        return super(DecimalEncoder, self).default(obj)
-
-# LaTeX compilation cache
-LATEX_CACHE = {}
-CACHE_EXPIRY = 3600  # Cache expiry in seconds (1 hour)
-
-# Data loading and saving functions
-def load_json_data(file_key, default=None):
-    """Generic function to load JSON data from a file"""
-    file_path = app.config.get(file_key)
-    if file_path and os.path.exists(file_path):
-        with open(file_path, 'r') as f:
-            return json.load(f)
-    return default or []
-
-def save_json_data(file_key, data, use_decimal_encoder=False):
-    """Generic function to save JSON data to a file"""
-    file_path = app.config.get(file_key)
-    if file_path:
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, 'w') as f:
-            json.dump(data, f, indent=4, cls=DecimalEncoder if use_decimal_encoder else None)
+from app.storage import get_storage, StaleDataError
+from app.svg_store import SvgStore, svg_data_uri, decode_svg_data_uri, COMPRESSED_ENCODINGS
+from app.latex import ensure_complete_latex_document, get_latex_cache_key, render_latex, RenderResult
+from app.render_cache import get_render_cache, MemoryRenderCache
+from app.render_queue import RenderQueue, create_render_scheduler, INTERACTIVE
+from app.compile_jobs import CompileJobs
+from app.sandbox import SandboxLimits
+from app.search_index import SearchIndex
+from app.tag_index import TagIndex, MATCH_ANY, MATCH_ALL
+from app.pagination import paginate, encode_cursor, decode_cursor
+from app.sort_index import SortIndex
+from app.field_index import FieldIndex
+from app.unit_of_work import UnitOfWork
+
+# LaTeX compilation cache, in front of the on-disk render cache
+LATEX_CACHE = MemoryRenderCache(app.config['LATEX_MEMORY_CACHE_MAX_BYTES'], app.config['LATEX_MEMORY_CACHE_TTL'])
+
+# Data loading and saving functions (backend selected by STORAGE_BACKEND in Config)
+get_data_storage = lambda: get_storage(app.config)
+
+def get_request_data():
+    """The request's UnitOfWork over the storage backend (the backend itself outside requests).
+
+    Within a request each store is loaded once; writes go straight to storage.
+    """
+    if not has_request_context():
+        return get_data_storage()
+    if 'unit_of_work' not in g:
+        g.unit_of_work = UnitOfWork(get_data_storage())
+    return g.unit_of_work
+
+load_store = lambda store: get_request_data().load(store)
+load_store_versioned = lambda store: get_request_data().load_versioned(store)
+load_store_item = lambda store, item_id: get_request_data().get(store, item_id)
 
 # Specific data functions
-load_questions = lambda include_deleted=False: [q for q in load_json_data('QUESTIONS_FILE') if include_deleted or not q.get('deleted', False)]
-save_questions = lambda questions: save_json_data('QUESTIONS_FILE', questions, use_decimal_encoder=True)
-load_submissions = lambda: load_json_data('SUBMISSIONS_FILE')
-save_submissions = lambda submissions: save_json_data('SUBMISSIONS_FILE', submissions)
-load_quizzes = lambda: load_json_data('QUIZZES_FILE')
-save_quizzes = lambda quizzes: save_json_data('QUIZZES_FILE', quizzes)
-load_tags = lambda: load_json_data('TAGS_FILE')
-save_tags = lambda tags: save_json_data('TAGS_FILE', tags)
-load_quiz_tags = lambda: load_json_data('QUIZ_TAGS_FILE')
-save_quiz_tags = lambda tags: save_json_data('QUIZ_TAGS_FILE', tags)
+load_questions = lambda include_deleted=False: [q for q in load_store('questions') if include_deleted or not q.get('deleted', False)]
+save_question = lambda question: get_request_data().upsert('questions', question)
+find_submissions = lambda field, value: get_request_data().find('submissions', field, value)
+append_submission = lambda submission: get_request_data().append('submissions', submission)
+load_quizzes = lambda: load_store('quizzes')
+save_quiz = lambda quiz: get_request_data().upsert('quizzes', quiz)
+load_tags = lambda: load_store('tags')
+load_quiz_tags = lambda: load_store('quiz_tags')
+
+load_quiz = lambda quiz_id: load_store_item('quizzes', quiz_id)
+
+def load_question(question_id, include_deleted=False):
+    """Load a single question by id, honouring the deleted flag like load_questions"""
+    question = load_store_item('questions', question_id)
+    if question and (include_deleted or not question.get('deleted', False)):
+        return question
+    return None
 
 # Helper functions
 get_item_by_id = lambda items, item_id: next((item for item in items if item.get('id') == item_id), None)
 
 def get_question_or_404(question_id, include_deleted=False):
-    question = get_item_by_id(load_questions(include_deleted=include_deleted), question_id)
+    question = load_question(question_id, include_deleted=include_deleted)
     if not question:
         flash('Question not found!', 'error')
     return question
 
 def get_quiz_or_404(quiz_id):
-    quiz = get_item_by_id(load_quizzes(), quiz_id)
+    quiz = load_quiz(quiz_id)
     if not quiz:
         flash('Quiz not found!', 'error')
     return quiz
 
-def update_question_in_list(question_id, updated_question):
-    questions = load_questions(include_deleted=True)
-    for i, q in enumerate(questions):
-        if q.get('id') == question_id:
-            questions[i] = updated_question
-            break
-    save_questions(questions)
-
-def generate_question_svg(question):
-    """Generate SVG for a single question if needed"""
-    if not question.get('svg') or question.get('svg_generated') is False:
-        try:
-            question['svg'] = latex_to_svg(ensure_complete_latex_document(question['content']))
+get_svg_store = lambda: SvgStore(app.config['SVG_STORE_FOLDER'])
+
+def move_inline_svg_to_store(question):
+    """Move a legacy inline SVG data URI into the asset store, keeping only its hash.
+
+    Returns True if the question record changed.
+    """
+    if 'svg' not in question:
+        return False
+    svg = decode_svg_data_uri(question.pop('svg'))
+    if svg is not None and question.get('svg_generated') is not False:
+        question['svg_hash'] = get_svg_store().put(get_latex_cache_key(ensure_complete_latex_document(question['content'])), svg)
+    else:
+        # Empty or placeholder value: render it again on next view
+        question['svg_generated'] = False
+    return True
+
+def generate_question_svg(question, render_jobs=None):
+    """Attach a rendered SVG to a question if one is available, otherwise queue a background render.
+
+    Returns True if the question record changed. Questions waiting for a
+    render are left untouched; the render pool saves them once it finishes.
+    If `render_jobs` is a list, the render is added to it for the caller to
+    submit as a batch instead of being queued straight away.
+    """
+    changed = move_inline_svg_to_store(question)
+    if question_has_svg(question):
+        return changed
+    try:
+        complete_latex = ensure_complete_latex_document(question['content'])
+        cache_key = get_latex_cache_key(complete_latex)
+        if not get_svg_store().exists(cache_key):
+            svg_data = get_cached_latex_svg(cache_key)
+            if svg_data is None:
+                if get_render_failure(cache_key):
+                    return changed
+                job = (cache_key, complete_latex, question['id'])
+                if render_jobs is None:
+                    get_render_queue().submit(*job)
+                else:
+                    render_jobs.append(job)
+                return changed
+            get_svg_store().put(cache_key, svg_data)
+        question['svg_hash'] = cache_key
+        question['svg_generated'] = True
+    except Exception as e:
+        app.logger.error(f"Error generating SVG for question {question.get('id')}: {str(e)}")
+        question.pop('svg_hash', None)
+        question['svg_generated'] = False
+    return True
+
+question_has_svg = lambda question: bool(question.get('svg_hash')) and question.get('svg_generated') is not False and get_svg_store().exists(question['svg_hash'])
+def question_svg_rendering(question):
+    """Whether a question's SVG is still being rendered; pages showing one are left out of the page cache"""
+    rendering = not question_has_svg(question) and get_render_queue().is_pending(question.get('id'))
+    if rendering:
+        g.page_uncacheable = True
+    return rendering
+
+def on_question_svg_rendered(cache_key, question_ids, result):
+    """Render pool callback: store a successful SVG and point every waiting question at it.
+
+    Failed renders are not stored as the questions' SVGs. They are recorded
+    with record_render_failure instead: the questions show the error, and
+    only stopped or crashed renders are queued again, after a delay.
+    """
+    with app.app_context():
+        record_render_result(cache_key, result)
+        if not result.ok:
+            record_render_failure(cache_key, result)
+            return
+        get_svg_store().put(cache_key, result.svg)
+        attach_question_svgs(question_ids, cache_key)
+
+def attach_question_svgs(question_ids, cache_key):
+    """Save a finished render on the waiting questions in one write, skipping any whose content changed while it was rendering"""
+    question_ids = set(question_ids)
+    with get_request_data().transaction('questions') as questions:
+        for question in questions:
+            if question.get('id') not in question_ids or question_has_svg(question):
+                continue
+            if get_latex_cache_key(ensure_complete_latex_document(question['content'])) != cache_key:
+                continue
+            question.pop('svg', None)
+            question['svg_hash'] = cache_key
             question['svg_generated'] = True
-        except Exception as e:
-            app.logger.error(f"Error generating SVG for question {question.get('id')}: {str(e)}")
-            question['svg'] = '/static/img/latex-placeholder.svg'
-            question['svg_generated'] = False
-        return True
-    return False
+
+_render_scheduler = None
+_render_queue = None
+
+def get_render_scheduler():
+    """Worker pool shared by previews (interactive priority) and question renders (batch priority)"""
+    global _render_scheduler
+    if _render_scheduler is None:
+        _render_scheduler = create_render_scheduler(app.config['RENDER_WORKERS'], app.config['RENDER_INTERACTIVE_RESERVED'])
+    return _render_scheduler
+
+def get_render_queue():
+    global _render_queue
+    if _render_queue is None:
+        _render_queue = RenderQueue(get_render_scheduler(), on_question_svg_rendered,
+                                    app.config['RENDER_BATCH_SIZE'], app.config['LATEX_FORMAT_FOLDER'],
+                                    get_render_limits())
+    return _render_queue
+
+def stored_svg_url(svg_hash):
+    """URL of a stored SVG, versioned by a digest of its bytes; None if it is not stored"""
+    digest = get_svg_store().digest(svg_hash) if svg_hash else None
+    return url_for('question_svg', svg_hash=svg_hash, v=digest) if digest else None
+
+def question_svg_src(question):
+    """Image source for a question's rendered SVG, its render error, or the placeholder while it has neither"""
+    src = stored_svg_url(question.get('svg_hash'))
+    if src:
+        return src
+    failure = question_svg_failure(question)
+    if failure:
+        return svg_data_uri(failure.svg)
+    return question.get('svg') or url_for('static', filename='img/latex-placeholder.svg')
+
+# Question fields written by generate_question_svg
+SVG_FIELDS = ('svg', 'svg_hash', 'svg_generated')
+
+def save_question_svgs(questions):
+    """Save only the SVG fields of questions changed by generate_question_svg, in one write.
+
+    The rest of each question is taken from storage, so edits saved in the
+    meantime are kept; a question whose content or version changed since it
+    was loaded is skipped, and picks up its SVG on a later view.
+    """
+    changed = {question['id']: question for question in questions}
+    if not changed:
+        return
+    with get_request_data().transaction('questions') as stored_questions:
+        for stored in stored_questions:
+            question = changed.get(stored.get('id'))
+            if question is None or stored.get('content') != question.get('content'):
+                continue
+            if stored.get('version', 0) != question.get('version', 0):
+                continue
+            if all(stored.get(field) == question.get(field) for field in SVG_FIELDS):
+                continue
+            for field in SVG_FIELDS:
+                if field in question:
+                    stored[field] = question[field]
+                else:
+                    stored.pop(field, None)
 
 def generate_question_svgs(questions):
-    """Generate SVGs for questions that need them"""
-    updated = any(generate_question_svg(q) for q in questions)
-    if updated:
-        save_questions(load_questions(include_deleted=True))
+    """Generate SVGs for questions that need them, rendering the missing ones in batches and saving the changed ones in one write"""
+    render_jobs = []
+    updated = [q for q in questions if generate_question_svg(q, render_jobs)]
+    if render_jobs:
+        get_render_queue().submit_many(render_jobs)
+    save_question_svgs(updated)
 
 def validate_hint_data(data):
     """Validate hint text and weight, return (is_valid, error_message, hint_text, weight)"""
@@ -126,8 +267,7 @@ def validate_hint_data(data):
 
 def get_question_and_hint(question_id, hint_id=None):
     """Get question and optionally hint, return (question, hint) or (None, None) if not found"""
-    questions = load_questions(include_deleted=True)
-    question = get_item_by_id(questions, question_id)
+    question = load_question(question_id, include_deleted=True)
     
     if not question:
         return None, None
@@ -138,12 +278,29 @@ def get_question_and_hint(question_id, hint_id=None):
     
     return question, None
 
-def handle_tag_management(request, load_func, save_func, is_quiz_tags=False):
+def modify_question(question_id, change, attempts=3):
+    """Load a question, apply change(question) in place and save it.
+
+    If another write (such as a background SVG render finishing) saved the
+    question in the meantime, the change is re-applied to a fresh copy.
+    Returns the saved question, or None if it does not exist.
+    """
+    for attempt in range(attempts):
+        question = load_question(question_id, include_deleted=True)
+        if not question:
+            return None
+        change(question)
+        try:
+            save_question(question)
+            return question
+        except StaleDataError:
+            if attempt == attempts - 1:
+                raise
+
+def handle_tag_management(request, tag_store, is_quiz_tags=False):
     """Generic function to handle tag management operations"""
-    tags = load_func()
-    
     if request.method == 'GET':
-        return jsonify(tags)
+        return jsonify(load_store(tag_store))
         
     elif request.method == 'POST':
         data = request.get_json()
@@ -151,13 +308,12 @@ def handle_tag_management(request, load_func, save_func, is_quiz_tags=False):
             return jsonify({'success': False, 'error': 'No display name provided'}), 400
             
         tag_id = data.get('id', data['display_name'].lower().replace(' ', '_'))
-        
-        if any(tag['id'] == tag_id for tag in tags):
-            return jsonify({'success': False, 'error': 'Tag ID already exists'}), 400
-            
         new_tag = {'id': tag_id, 'display_name': data['display_name']}
-        tags.append(new_tag)
-        save_func(tags)
+        
+        with get_request_data().transaction(tag_store) as tags:
+            if any(tag['id'] == tag_id for tag in tags):
+                return jsonify({'success': False, 'error': 'Tag ID already exists'}), 400
+            tags.append(new_tag)
         
         return jsonify({'success': True, 'tag': new_tag})
         
@@ -166,12 +322,11 @@ def handle_tag_management(request, load_func, save_func, is_quiz_tags=False):
         if not data or 'id' not in data or 'display_name' not in data:
             return jsonify({'success': False, 'error': 'Missing required fields'}), 400
             
-        tag_to_update = get_item_by_id(tags, data['id'])
-        if not tag_to_update:
-            return jsonify({'success': False, 'error': 'Tag not found'}), 404
-            
-        tag_to_update['display_name'] = data['display_name']
-        save_func(tags)
+        with get_request_data().transaction(tag_store) as tags:
+            tag_to_update = get_item_by_id(tags, data['id'])
+            if not tag_to_update:
+                return jsonify({'success': False, 'error': 'Tag not found'}), 404
+            tag_to_update['display_name'] = data['display_name']
         
         return jsonify({'success': True, 'tag': tag_to_update})
         
@@ -180,168 +335,110 @@ def handle_tag_management(request, load_func, save_func, is_quiz_tags=False):
         if not data or 'id' not in data:
             return jsonify({'success': False, 'error': 'No tag ID provided'}), 400
             
-        tag_to_delete = get_item_by_id(tags, data['id'])
-        if not tag_to_delete:
-            return jsonify({'success': False, 'error': 'Tag not found'}), 404
-            
-        tags.remove(tag_to_delete)
-        save_func(tags)
+        with get_request_data().transaction(tag_store) as tags:
+            tag_to_delete = get_item_by_id(tags, data['id'])
+            if not tag_to_delete:
+                return jsonify({'success': False, 'error': 'Tag not found'}), 404
+            tags.remove(tag_to_delete)
         
-        # Remove tag from related items
-        if is_quiz_tags:
-            # Remove from all quizzes
-            quizzes = load_quizzes()
-            updated = False
-            for quiz in quizzes:
-                if 'tags' in quiz and data['id'] in quiz['tags']:
-                    quiz['tags'].remove(data['id'])
-                    updated = True
-            if updated:
-                save_quizzes(quizzes)
-        else:
-            # Remove from all questions
-            questions = load_questions(include_deleted=True)
-            updated = False
-            for question in questions:
-                if data['id'] in question.get('tags', []):
-                    question['tags'].remove(data['id'])
-                    updated = True
-            if updated:
-                save_questions(questions)
+        # Remove tag from related items (only the items that carry it are changed)
+        with get_request_data().transaction('quizzes' if is_quiz_tags else 'questions') as items:
+            for item in items:
+                if data['id'] in item.get('tags', []):
+                    item['tags'].remove(data['id'])
         
         return jsonify({'success': True})
 
 # Tag functions
+def tag_lookup(store):
+    """Id -> tag dictionary for 'tags' or 'quiz_tags', loaded once per request and shared by every badge rendered.
+
+    The tags in it are shared too, so callers must not modify them.
+    """
+    lookups = g.setdefault('tag_lookups', {})
+    if store not in lookups:
+        lookups[store] = {tag.get('id'): tag for tag in load_store(store)}
+    return lookups[store]
+
 get_all_tags = load_tags
-get_tag_by_id = lambda tag_id: get_item_by_id(load_tags(), tag_id)
+get_tag_by_id = lambda tag_id: tag_lookup('tags').get(tag_id)
 get_all_quiz_tags = load_quiz_tags
-get_quiz_tag_by_id = lambda tag_id: get_item_by_id(load_quiz_tags(), tag_id)
+get_quiz_tag_by_id = lambda tag_id: tag_lookup('quiz_tags').get(tag_id)
 get_tag_display_name = lambda tag_id: (get_tag_by_id(tag_id) or {}).get('display_name', tag_id)
 get_quiz_tag_display_name = lambda tag_id: (get_quiz_tag_by_id(tag_id) or {}).get('display_name', tag_id)
 
-get_latex_cache_key = lambda latex_string: hashlib.md5(latex_string.encode('utf-8')).hexdigest()
-
-def latex_to_svg(latex_string):
-    """Convert LaTeX to SVG using command line tools with caching."""
-    cache_key = get_latex_cache_key(latex_string)
-    current_time = time.time()
-    
-    # Return from cache if available and not expired
-    if cache_key in LATEX_CACHE:
-        cached_item = LATEX_CACHE[cache_key]
-        if current_time - cached_item['timestamp'] < CACHE_EXPIRY:
-            return cached_item['svg']
-    
-    # Generate SVG and cache it
-    svg_data = _generate_latex_svg(latex_string)
-    LATEX_CACHE[cache_key] = {'svg': svg_data, 'timestamp': current_time}
-    
-    # Clean expired entries
-    for k in [k for k, v in LATEX_CACHE.items() if current_time - v['timestamp'] > CACHE_EXPIRY]:
-        del LATEX_CACHE[k]
-    
+get_latex_render_cache = lambda: get_render_cache(app.config['RENDER_CACHE_DATABASE'], app.config['RENDER_CACHE_MAX_BYTES'])
+
+get_render_limits = lambda: SandboxLimits(
+    timeout=app.config['LATEX_TIMEOUT'],
+    cpu_seconds=app.config['LATEX_CPU_LIMIT'],
+    memory_bytes=app.config['LATEX_MEMORY_LIMIT'],
+    output_bytes=app.config['LATEX_OUTPUT_LIMIT'],
+    shell_escape=app.config['LATEX_SHELL_ESCAPE'],
+)
+
+def get_cached_latex_svg(cache_key):
+    """Look up a render in the per-process cache, then the on-disk cache shared by all workers"""
+    svg_data = LATEX_CACHE.get(cache_key)
+    if svg_data is None:
+        svg_data = get_latex_render_cache().get(cache_key)
+        if svg_data is not None:
+            LATEX_CACHE.put(cache_key, svg_data)
     return svg_data
 
-def _generate_latex_svg(latex_string):
-    """Internal function to generate SVG from LaTeX without caching."""
-    def create_error_svg(error_message):
-        error_svg = f'''<?xml version="1.0" encoding="UTF-8"?>
-<svg xmlns="http://www.w3.org/2000/svg" width="500" height="100" viewBox="0 0 500 100">
-    <rect width="500" height="100" fill="#f8d7da" stroke="#f5c6cb" stroke-width="1" rx="5" ry="5"/>
-    <text x="50%" y="50%" text-anchor="middle" dominant-baseline="middle" font-family="Arial" font-size="14" fill="#721c24">
-        {error_message}
-    </text>
-</svg>'''
-        return f"data:image/svg+xml;base64,{base64.b64encode(error_svg.encode()).decode('ascii')}"
-
-    with tempfile.TemporaryDirectory() as temp_dir:
-        tex_file = os.path.join(temp_dir, "content.tex")
-        with open(tex_file, "w") as f:
-            f.write(latex_string + "\n\n")
-        
-        try:
-            # Run pdflatex
-            result = subprocess.run(
-                ["pdflatex", "-shell-escape", "-interaction=nonstopmode", "-output-directory", temp_dir, tex_file],
-                check=False, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-            )
-            
-            if result.returncode != 0:
-                return create_error_svg("LaTeX compilation failed")
-            
-            # Convert PDF to SVG
-            pdf_file = os.path.join(temp_dir, "content.pdf")
-            svg_file = os.path.join(temp_dir, "content.svg")
-            
-            if os.path.exists(pdf_file):
-                subprocess.run(["pdf2svg", pdf_file, svg_file], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                with open(svg_file, "r") as f:
-                    svg_content = f.read()
-                return f"data:image/svg+xml;base64,{base64.b64encode(svg_content.encode()).decode('ascii')}"
-            else:
-                return create_error_svg("PDF file was not created")
-            
-        except Exception as e:
-            return create_error_svg(f"Error: {str(e)}")
-
-# New function to ensure a complete LaTeX document
-def ensure_complete_latex_document(latex_content):
-    """Makes sure the LaTeX content is a complete document by adding preamble and document environment if needed."""
-    # Check if it's already a complete document
-    if "\\documentclass" in latex_content:
-        return latex_content
-    
-    # Detect what environments are present to add appropriate packages
-    packages = ["\\usepackage{amsmath}", "\\usepackage{amssymb}"]
-    
-    # Add tikz package if needed
-    if "\\begin{tikzpicture}" in latex_content:
-        packages.append("\\usepackage{tikz}")
-    
-    # Add circuitikz package if needed
-    if "\\begin{circuitikz}" in latex_content:
-        packages.append("\\usepackage{circuitikz}")
-    
-    # Add enumitem if enumerate is used with custom labels
-    if "\\begin{enumerate}" in latex_content:
-        packages.append("\\usepackage{enumitem}")
-        
-    # Add geometry package for better margins
-    packages.append("\\usepackage{geometry}")
-    packages.append("\\geometry{margin=1in}")
-    
-    # Add preview package for cropping white space
-    packages.append("\\usepackage[active,tightpage]{preview}")
-    
-    # Create a complete document using exam document class
-    complete_document = "\\documentclass{exam}\n"
-    complete_document += "\n".join(packages) + "\n\n"
-    
-    # Add preview environment based on what's in the content
-    preview_env = "document"  # Default to previewing the whole document
-    
-    # Check for specific environments to preview
-    if "\\begin{questions}" in latex_content:
-        preview_env = "questions"
-    elif "\\begin{tikzpicture}" in latex_content:
-        preview_env = "tikzpicture"
-    elif "\\begin{circuitikz}" in latex_content:
-        preview_env = "circuitikz"
-        
-    complete_document += f"\\PreviewEnvironment{{{preview_env}}}\n\n"
-    complete_document += "\\begin{document}\n\n"
-    
-    # For plain math expressions, wrap in questions environment to benefit from preview
-    if not any(env in latex_content for env in ["\\begin{questions}", "\\begin{tikzpicture}", "\\begin{circuitikz}"]):
-        complete_document += "\\begin{questions}\n\\question\n"
-        complete_document += latex_content + "\n"
-        complete_document += "\\end{questions}\n"
-    else:
-        complete_document += latex_content + "\n\n"
-        
-    complete_document += "\\end{document}"
-    
-    return complete_document
+def cache_latex_svg(cache_key, svg_data):
+    """Remember a successful render in both caches"""
+    get_latex_render_cache().put(cache_key, svg_data)
+    LATEX_CACHE.put(cache_key, svg_data)
+
+def render_latex_result(latex_string):
+    """Convert LaTeX to SVG using command line tools with caching, returning a RenderResult.
+
+    Looks in the per-process cache, then the on-disk render cache shared by all
+    workers, and only runs pdflatex when both miss.
+    """
+    svg_data = get_cached_latex_svg(get_latex_cache_key(latex_string))
+    if svg_data is not None:
+        return RenderResult(svg_data, True, None)
+    return start_interactive_render(latex_string).result()
+
+def start_interactive_render(latex_string):
+    """Queue a preview render ahead of background question renders; returns a Future of its RenderResult"""
+    cache_key = get_latex_cache_key(latex_string)
+    future = get_render_scheduler().submit(INTERACTIVE, render_latex, latex_string,
+                                           app.config['LATEX_FORMAT_FOLDER'], get_render_limits())
+    future.add_done_callback(lambda f: f.cancelled() or f.exception() or record_render_result(cache_key, f.result()))
+    return future
+
+def record_render_result(cache_key, result):
+    """Cache a successful render; count renders the sandbox had to stop"""
+    if result.ok:
+        cache_latex_svg(cache_key, result.svg)
+    elif result.killed:
+        app.logger.warning(f"LaTeX render {cache_key} stopped: {result.error}")
+        get_latex_render_cache().count_killed()
+
+def record_render_failure(cache_key, result):
+    """Remember a failed question render, so its questions show the error instead of queueing it on every view"""
+    get_latex_render_cache().put_failure(cache_key, result.svg, result.error, result.permanent,
+                                         app.config['RENDER_RETRY_DELAY'], app.config['RENDER_RETRY_MAX_DELAY'])
+
+def get_render_failure(cache_key):
+    """The failure of a document's last render while it stands: always if it does not compile, else until its retry time"""
+    failure = get_latex_render_cache().get_failure(cache_key)
+    if failure and (failure.permanent or failure.retry_at > time.time()):
+        return failure
+    return None
+
+def question_svg_failure(question):
+    """The standing render failure of a question without an SVG, or None"""
+    if question_has_svg(question) or not question.get('content'):
+        return None
+    return get_render_failure(get_latex_cache_key(ensure_complete_latex_document(question['content'])))
+
+render_latex_svg = lambda latex_string: render_latex_result(latex_string).svg
+
+latex_to_svg = lambda latex_string: svg_data_uri(render_latex_svg(latex_string))
 
 @app.route('/api/compile-latex', methods=['POST'])
 def compile_latex():
@@ -369,6 +466,149 @@ def compile_latex():
             'error': str(e)
         }), 500
 
+# Live preview compilations, run at interactive priority on the render scheduler
+compile_jobs = CompileJobs(start_interactive_render)
+
+def compile_job_payload(job_id, status, result=None, error=None):
+    payload = {'success': status != 'failed', 'job_id': job_id, 'status': status}
+    if result is not None:
+        payload['svg'] = svg_data_uri(result.svg)
+        if not result.ok:
+            payload['compile_error'] = result.error
+    if error:
+        payload['error'] = error
+    return payload
+
+# A versioned SVG URL only ever serves the bytes its digest names, so browsers and proxies may keep it for good
+SVG_CACHE_MAX_AGE = 365 * 24 * 3600
+
+@app.route('/svg/<svg_hash>.svg')
+def question_svg(svg_hash):
+    """Serve a rendered question SVG from the asset store with a digest ETag.
+
+    Requested with the current digest as `v` (see stored_svg_url) the
+    response is cached as immutable.
+    """
+    svg_store = get_svg_store()
+    digest = svg_store.digest(svg_hash)
+    if digest is None:
+        abort(404)
+    # Only the current digest's URL may be cached for good; stale or missing versions revalidate every time
+    max_age = SVG_CACHE_MAX_AGE if request.args.get('v') == digest else None
+    
+    # Serve a precompressed copy when the client accepts it; each encoding is its own representation
+    encoding = next((encoding for encoding in COMPRESSED_ENCODINGS if encoding in request.accept_encodings
+                     and svg_store.compressed_path(svg_hash, encoding)), None)
+    if encoding:
+        response = send_file(svg_store.compressed_path(svg_hash, encoding), mimetype='image/svg+xml',
+                             etag=f"{svg_hash}-{digest}-{encoding}", conditional=True, max_age=max_age)
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = send_file(svg_store.path(svg_hash), mimetype='image/svg+xml', etag=f"{svg_hash}-{digest}",
+                             conditional=True, max_age=max_age)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = max_age is not None
+    return response
+
+@app.route('/api/compile-jobs', methods=['POST'])
+def create_compile_job():
+    """API endpoint to start compiling LaTeX in the background; returns a job id to poll or stream.
+
+    `editor_id` identifies one editor on one page: a new job from it cancels
+    the previous one. Documents already in the render cache are returned at once.
+    """
+    data = request.get_json(silent=True)
+    if not data or 'latex' not in data:
+        return jsonify({'success': False, 'error': 'No LaTeX content provided'}), 400
+    
+    complete_latex = ensure_complete_latex_document(data['latex'])
+    cache_key = get_latex_cache_key(complete_latex)
+    svg_data = get_cached_latex_svg(cache_key)
+    if svg_data is not None:
+        return jsonify(compile_job_payload(None, 'done', RenderResult(svg_data, True, None)))
+    
+    job = compile_jobs.submit(cache_key, complete_latex, editor_id=data.get('editor_id'))
+    return jsonify(compile_job_payload(job.id, job.status)), 202
+
+def get_compile_job_payload(job_id):
+    """Current payload for a job, or None if unknown; jobs started by another worker are answered from the render cache"""
+    job = compile_jobs.get(job_id)
+    if job is not None:
+        return compile_job_payload(job.id, job.status, job.result, job.error)
+    svg_data = get_cached_latex_svg(job_id.split('-')[0])
+    if svg_data is not None:
+        return compile_job_payload(job_id, 'done', RenderResult(svg_data, True, None))
+    return None
+
+@app.route('/api/compile-jobs/<job_id>', methods=['GET', 'DELETE'])
+def compile_job_status(job_id):
+    """API endpoint to poll or cancel a compile job"""
+    if request.method == 'DELETE':
+        job = compile_jobs.cancel(job_id)
+        if job is None:
+            return jsonify({'success': False, 'error': 'Unknown job'}), 404
+        return jsonify(compile_job_payload(job.id, job.status, job.result, job.error))
+    
+    payload = get_compile_job_payload(job_id)
+    if payload is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+    return jsonify(payload)
+
+@app.route('/api/compile-jobs/<job_id>/events')
+def compile_job_events(job_id):
+    """Server-sent events stream that delivers one compile job's result when it finishes"""
+    job = compile_jobs.get(job_id)
+    
+    def events():
+        if job is not None:
+            deadline = time.time() + 120
+            # Comment lines keep proxies from closing the idle connection
+            while not job.done.wait(15) and time.time() < deadline:
+                yield ': waiting\n\n'
+        payload = get_compile_job_payload(job_id) or {'success': False, 'job_id': job_id, 'error': 'Unknown job'}
+        yield f"data: {json.dumps(payload)}\n\n"
+    
+    return Response(events(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/render-stats')
+def render_stats():
+    """API endpoint exposing LaTeX render cache counters for monitoring"""
+    return jsonify({
+        'memory_cache': LATEX_CACHE.stats(),
+        'render_cache': get_latex_render_cache().stats(),
+        'compile_jobs': compile_jobs.stats(),
+        'render_queue': {'pending': get_render_queue().pending_count()},
+        'scheduler': get_render_scheduler().stats(),
+        'page_cache': PAGE_CACHE.stats()
+    })
+
+@app.route('/api/questions/svg-status')
+def question_svg_status():
+    """API endpoint polled by pages waiting for background renders: state ('ready', 'rendering' or 'failed') and image source per question id"""
+    statuses = {}
+    updated = []
+    for question_id in request.args.getlist('ids')[:200]:
+        question = load_question(question_id, include_deleted=True)
+        if not question:
+            statuses[question_id] = {'state': 'missing'}
+            continue
+        # Pick up renders finished by another worker, or queue the question here if nobody is rendering it
+        if not question_has_svg(question) and not get_render_queue().is_pending(question_id):
+            if generate_question_svg(question):
+                updated.append(question)
+        if question_has_svg(question):
+            statuses[question_id] = {'state': 'ready', 'src': question_svg_src(question)}
+        elif get_render_queue().is_pending(question_id):
+            statuses[question_id] = {'state': 'rendering'}
+        else:
+            # Not rendering any more: the render failed, and is only retried on a later view if it may succeed
+            failure = question_svg_failure(question)
+            statuses[question_id] = {'state': 'failed', 'src': question_svg_src(question),
+                                     'error': failure.error if failure else None}
+    save_question_svgs(updated)
+    return jsonify(statuses)
+
 def save_attachment(file, question_id):
     """Save an uploaded attachment file"""
     attachment_dir = os.path.join(app.config['UPLOAD_FOLDER'], question_id)
@@ -410,69 +650,238 @@ def save_attachment(file, question_id):
     
     return attachment
 
+# In-memory indexes over the stores, shared by the request threads
+QUESTION_SEARCH_INDEX = SearchIndex()
+QUESTION_TAG_INDEX = TagIndex()
+QUIZ_TAG_INDEX = TagIndex()
+# Listing orders kept sorted; keys end with the id so every question has its own cursor position
+QUESTION_SORT_INDEX = SortIndex({
+    'newest': lambda q: (q.get('seq') or 0, q.get('id', '')),
+    'rating': lambda q: (float(q.get('rating') or 0), q.get('id', '')),
+})
+# The small question fields listings need, so they only load whole questions for the page shown
+QUESTION_SUMMARY_FIELDS = ('id', 'name', 'rating', 'tags', 'deleted', 'seq', 'created_at', 'edited_from',
+                           'svg_hash', 'svg_generated')
+QUESTION_SUMMARIES = FieldIndex(QUESTION_SUMMARY_FIELDS)
+
+# Indexes per store, synced together from a single load when the store changes
+STORE_INDEXES = {
+    'questions': (QUESTION_SUMMARIES, QUESTION_SEARCH_INDEX, QUESTION_TAG_INDEX, QUESTION_SORT_INDEX),
+    'quizzes': (QUIZ_TAG_INDEX,),
+}
+
+def synced_index(index, store):
+    """Return an index brought up to date with its store, touching only what changed"""
+    if index.version is None or index.version != get_data_storage().version(store):
+        version, items = load_store_versioned(store)
+        for store_index in STORE_INDEXES[store]:
+            store_index.sync(version, items)
+    return index
+
+get_question_summaries = lambda: synced_index(QUESTION_SUMMARIES, 'questions')
+get_question_search_index = lambda: synced_index(QUESTION_SEARCH_INDEX, 'questions')
+get_question_tag_index = lambda: synced_index(QUESTION_TAG_INDEX, 'questions')
+get_question_sort_index = lambda: synced_index(QUESTION_SORT_INDEX, 'questions')
+get_quiz_tag_index = lambda: synced_index(QUIZ_TAG_INDEX, 'quizzes')
+get_tag_mode = lambda: MATCH_ALL if request.args.get('tag_mode') == MATCH_ALL else MATCH_ANY
+
+def filter_by_tags(items, tag_index, filter_tags, mode=MATCH_ANY):
+    """Keep the items carrying any (or all) of the filter tags, in their current order"""
+    matched = tag_index.match(filter_tags, mode, candidates=[item['id'] for item in items])
+    return [item for item in items if item['id'] in matched]
+
+tag_facets = lambda items, tag_index: tag_index.facets(item['id'] for item in items)
+
+# Question listing sorts: (QUESTION_SORT_INDEX order, reverse)
+QUESTION_SORT_ORDERS = {
+    'newest': ('newest', True),
+    'rating_asc': ('rating', False),
+    'rating_desc': ('rating', True),
+}
+# Quiz listing sorts: (key, reverse). Keys end with the id so every item has its own cursor position.
+QUIZ_SORT_KEYS = {
+    'newest': (lambda q: (q.get('seq') or 0, q['id']), True),
+    'name_asc': (lambda q: (q.get('name', '').lower(), q['id']), False),
+    'name_desc': (lambda q: (q.get('name', '').lower(), q['id']), True),
+    'questions_asc': (lambda q: (len(q.get('question_ids', [])), q['id']), False),
+    'questions_desc': (lambda q: (len(q.get('question_ids', [])), q['id']), True),
+}
+
+def next_page_url(cursor):
+    """URL of the current listing continued after a cursor, or None on the last page"""
+    if cursor is None:
+        return None
+    # The query string is built separately so its keys cannot clash with view args or url_for's own options
+    args = request.args.copy()
+    args['cursor'] = cursor
+    return f"{url_for(request.endpoint, **(request.view_args or {}))}?{urlencode(list(args.items(multi=True)))}"
+
+def sort_and_paginate(items, sort_key, reverse=False, page_size=20):
+    """Sort items in place and return (page for the request's cursor, next page URL)"""
+    items.sort(key=sort_key, reverse=reverse)
+    page, next_cursor = paginate(items, sort_key, request.args.get('cursor'), page_size, reverse)
+    return page, next_page_url(next_cursor)
+
+def find_question_ids(filter_tags, tag_mode, search_query, sort_by, include_deleted=False, page_size=20):
+    """Filter, search and order questions using only the in-memory indexes.
+
+    Returns (ids on the page for the request's cursor, next cursor or None,
+    set of every matching id). Search results ranked by relevance are sorted
+    here; the other orders are read from QUESTION_SORT_INDEX, so the bank is
+    not sorted per request.
+    """
+    matches = set(get_question_summaries().ids(lambda q: include_deleted or not q.get('deleted', False)))
+    if filter_tags:
+        matches = get_question_tag_index().match(filter_tags, tag_mode, candidates=matches)
+    cursor = request.args.get('cursor')
+    if search_query:
+        scores = dict(get_question_search_index().search(search_query, candidates=matches, with_scores=True))
+        matches = set(scores)
+        if sort_by == 'relevance':
+            relevance = lambda question_id: (-scores[question_id], question_id)
+            page, next_cursor = paginate(sorted(scores, key=relevance), relevance, cursor, page_size)
+            return page, next_cursor, matches
+    order, reverse = QUESTION_SORT_ORDERS.get(sort_by, QUESTION_SORT_ORDERS['newest'])
+    page, next_key = get_question_sort_index().page(order, decode_cursor(cursor) if cursor else None, reverse, matches, page_size)
+    return page, encode_cursor(next_key) if next_key is not None else None, matches
+
+load_questions_by_id = lambda question_ids: [q for q in (load_question(i, include_deleted=True) for i in question_ids) if q]
+
+# Rendered pages, keyed by URL and the data versions they were built from
+PAGE_CACHE = MemoryRenderCache(app.config['PAGE_CACHE_MAX_BYTES'], app.config['PAGE_CACHE_TTL'])
+
+def code_version():
+    """Latest change to the app's modules and templates, so a deploy changes every page's ETag"""
+    template_dir = os.path.join(app.root_path, app.template_folder)
+    paths = [os.path.join(app.root_path, name) for name in os.listdir(app.root_path) if name.endswith('.py')]
+    paths += [os.path.join(root, name) for root, _, names in os.walk(template_dir) for name in names]
+    return max(os.stat(path).st_mtime_ns for path in paths)
+
+PAGE_CODE_VERSION = code_version()
+
+def conditional_page(*stores):
+    """Give a page an ETag derived from the data versions of the stores it shows.
+
+    A request revalidating a copy built from the same versions gets a 304
+    without the page being rendered; otherwise the page is rendered once per
+    URL and versions and kept in PAGE_CACHE. Pages with flash messages to
+    show, or with SVGs still rendering, are neither cached nor validated.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET' or session.get('_flashes'):
+                return view(*args, **kwargs)
+            # The ETag is the only validator: a modification time could not tell deploys or same-second writes apart
+            versions = [get_data_storage().version(store) for store in stores]
+            etag = hashlib.sha1(json.dumps([PAGE_CODE_VERSION, get_svg_store().generation(), request.full_path, versions])
+                                .encode('utf-8')).hexdigest()
+            
+            if not is_resource_modified(request.environ, etag=etag):
+                response = Response(status=304)
+            else:
+                html = PAGE_CACHE.get(etag)
+                if html is not None:
+                    response = Response(html, mimetype='text/html')
+                else:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200 or g.get('page_uncacheable') or session.get('_flashes'):
+                        return response
+                    PAGE_CACHE.put(etag, response.get_data(as_text=True))
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
+
 @app.route('/')
 def index():
     # Redirect to question bank page instead of about page
     return redirect(url_for('questionbank'))
 
 @app.route('/questionbank')
+@conditional_page('questions', 'tags')
 def questionbank():
     # Check if we should show deleted questions
     show_deleted = request.args.get('show_deleted', 'false').lower() == 'true'
     
-    # Get filter tags from request (can be multiple)
+    # Get filter tags from request (can be multiple), matched any-of or all-of
     filter_tags = request.args.getlist('tags')
-    sort_by = request.args.get('sort', 'newest')
+    tag_mode = get_tag_mode()
     
-    # Get search query if any
+    # Get search query if any; results are ranked by relevance unless another order is chosen
     search_query = request.args.get('search', '').strip().lower()
+    sort_by = request.args.get('sort', 'relevance' if search_query else 'newest')
     
-    # Load questions from the JSON file
-    questions = load_questions(include_deleted=show_deleted)
-    
-    # Filter by multiple tags if specified
-    if filter_tags:
-        filtered_questions = []
-        for question in questions:
-            # Check if any of the question's tags match any of the filter tags
-            if any(tag in question.get('tags', []) for tag in filter_tags):
-                filtered_questions.append(question)
-        questions = filtered_questions
-    
-    # Filter by search query if specified
-    if search_query:
-        search_results = []
-        for question in questions:
-            # Check if search query is in name or content
-            name = question.get('name', '').lower()
-            content = question.get('content', '').lower()
-            
-            if search_query in name or search_query in content:
-                search_results.append(question)
-        questions = search_results
-    
-    # Sort questions
-    if sort_by == 'rating_asc':
-        questions.sort(key=lambda x: float(x.get('rating', 0)))
-    elif sort_by == 'rating_desc':
-        questions.sort(key=lambda x: float(x.get('rating', 0)), reverse=True)
-    elif sort_by == 'newest':
-        questions.sort(key=lambda x: x.get('id', 0), reverse=True)
+    # Filter, search and sort from the indexes, then load only the questions on the requested page
+    page_ids, next_cursor, matches = find_question_ids(filter_tags, tag_mode, search_query, sort_by, show_deleted,
+                                                       app.config['QUESTIONS_PER_PAGE'])
+    page = load_questions_by_id(page_ids)
     
     # Generate SVGs for questions that need them
-    generate_question_svgs(questions)
+    generate_question_svgs(page)
     
     # Get all tags for the filter dropdown
     all_tags = get_all_tags()
     
-    return render_template('index.html', questions=questions, filter_tags=filter_tags, 
+    return render_template('index.html', questions=page, next_page_url=next_page_url(next_cursor), filter_tags=filter_tags, 
                           sort_by=sort_by, all_tags=all_tags, show_deleted=show_deleted,
-                          search_query=search_query)
+                          search_query=search_query, tag_mode=tag_mode, sort_chosen='sort' in request.args,
+                          tag_counts=get_question_tag_index().facets(matches))
+
+# Fields /api/questions can return besides the summary ones; content fields load the questions on the page
+API_QUESTION_CONTENT_FIELDS = ('content', 'answer', 'hints', 'attachments')
+API_QUESTION_FIELDS = QUESTION_SUMMARY_FIELDS + API_QUESTION_CONTENT_FIELDS + ('svg_url',)
+DEFAULT_API_QUESTION_FIELDS = 'id,name,rating,tags'
+
+def project_question(question, fields):
+    """The requested fields of a question, with svg_url pointing at its stored SVG if it has one"""
+    projected = {field: question.get(field) for field in fields if field != 'svg_url'}
+    if 'svg_url' in fields:
+        projected['svg_url'] = stored_svg_url(question['svg_hash']) if question_has_svg(question) else None
+    return projected
+
+@app.route('/api/questions')
+def api_questions():
+    """API endpoint listing questions with the questionbank's tags, tag_mode, search, sort and show_deleted
+    parameters, paged by cursor and trimmed to the comma-separated `fields` (id,name,rating,tags by default)"""
+    fields = [field.strip() for field in request.args.get('fields', DEFAULT_API_QUESTION_FIELDS).split(',') if field.strip()]
+    unknown = [field for field in fields if field not in API_QUESTION_FIELDS]
+    if unknown:
+        return jsonify({'success': False, 'error': f"Unknown fields: {', '.join(unknown)}",
+                        'fields': list(API_QUESTION_FIELDS)}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', app.config['QUESTIONS_PER_PAGE'])), 1),
+                    app.config['API_QUESTIONS_MAX_PAGE'])
+    except ValueError:
+        return jsonify({'success': False, 'error': 'limit must be a number'}), 400
+    
+    search_query = request.args.get('search', '').strip().lower()
+    sort_by = request.args.get('sort', 'relevance' if search_query else 'newest')
+    show_deleted = request.args.get('show_deleted', 'false').lower() == 'true'
+    page_ids, next_cursor, matches = find_question_ids(request.args.getlist('tags'), get_tag_mode(), search_query,
+                                                       sort_by, show_deleted, limit)
+    
+    # Summary fields come from the in-memory index; only content fields need the questions themselves
+    if any(field in API_QUESTION_CONTENT_FIELDS for field in fields):
+        questions = load_questions_by_id(page_ids)
+    else:
+        questions = get_question_summaries().get(page_ids)
+    
+    return jsonify({
+        'success': True,
+        'questions': [project_question(question, fields) for question in questions],
+        'total': len(matches),
+        'next_cursor': next_cursor,
+        'next': next_page_url(next_cursor)
+    })
 
 @app.route('/quizzes')
+@conditional_page('quizzes', 'quiz_tags')
 def quizzes():
     search_query = request.args.get('search', '').strip().lower()
     filter_tags = request.args.getlist('tags')
+    tag_mode = get_tag_mode()
     sort_by = request.args.get('sort', 'newest')
     show_deleted = request.args.get('show_deleted') == 'true'
     
@@ -486,99 +895,71 @@ def quizzes():
     
     # Filter by tags if selected
     if filter_tags:
-        filtered_quizzes = [q for q in filtered_quizzes if set(filter_tags).intersection(set(q.get('tags', [])))]
+        filtered_quizzes = filter_by_tags(filtered_quizzes, get_quiz_tag_index(), filter_tags, tag_mode)
     
     # Filter deleted quizzes
     if not show_deleted:
         filtered_quizzes = [q for q in filtered_quizzes if not q.get('deleted', False)]
     
     # Sort the quizzes
-    if sort_by == 'name_asc':
-        filtered_quizzes = sorted(filtered_quizzes, key=lambda q: q.get('name', '').lower())
-    elif sort_by == 'name_desc':
-        filtered_quizzes = sorted(filtered_quizzes, key=lambda q: q.get('name', '').lower(), reverse=True)
-    elif sort_by == 'questions_asc':
-        filtered_quizzes = sorted(filtered_quizzes, key=lambda q: len(q.get('question_ids', [])))
-    elif sort_by == 'questions_desc':
-        filtered_quizzes = sorted(filtered_quizzes, key=lambda q: len(q.get('question_ids', [])), reverse=True)
-    else:  # Default is 'newest' which is the default order (no sorting needed)
-        pass
+    sort_key, reverse = QUIZ_SORT_KEYS.get(sort_by, QUIZ_SORT_KEYS['newest'])
+    page, next_page = sort_and_paginate(filtered_quizzes, sort_key, reverse, app.config['QUIZZES_PER_PAGE'])
     
     # Get all quiz tags for the filter dropdown
     all_quiz_tags = get_all_quiz_tags()
     
     return render_template('quizzes.html', 
-                          quizzes=filtered_quizzes, 
+                          quizzes=page, 
+                          next_page_url=next_page,
                           search_query=search_query,
                           filter_tags=filter_tags,
+                          tag_mode=tag_mode,
+                          tag_counts=tag_facets(filtered_quizzes, get_quiz_tag_index()),
                           all_quiz_tags=all_quiz_tags,
                           sort_by=sort_by,
                           show_deleted=show_deleted)
 
-@app.route('/quizzes/new', methods=['GET', 'POST'])
-def create_quiz():
-    quiz_tags = get_all_quiz_tags()
-    all_tags = get_all_tags()
-    
+def list_quiz_questions():
+    """Filter, sort and paginate the questions offered on the create/edit quiz page.
+
+    Returns the template arguments for the question list.
+    """
     # Get filter parameters from request
     filter_tags = request.args.getlist('filter_tags') or []
+    tag_mode = get_tag_mode()
     search_query = request.args.get('search_query', '')
-    sort_by = request.args.get('sort_by', 'newest')
-    quiz_name = request.args.get('quiz_name', '')
-    selected_quiz_tags = request.args.getlist('selected_tags') or []
+    sort_by = request.args.get('sort_by', 'relevance' if search_query.strip() else 'newest')
     
-    # Load all questions, including deleted ones for admin viewing
-    all_questions = load_questions(include_deleted=True)
+    # Apply search and tag filters and sort_by, leaving out deleted questions
+    page_ids, next_cursor, matches = find_question_ids(filter_tags, tag_mode, search_query.strip(), sort_by,
+                                                       page_size=app.config['QUESTIONS_PER_PAGE'])
+    page = load_questions_by_id(page_ids)
     
-    # Filter out deleted questions for display by default
-    questions = [q for q in all_questions if not q.get('deleted', False)]
+    # Generate SVGs for the questions shown
+    generate_question_svgs(page)
     
-    # Generate SVGs for questions
-    generate_question_svgs(questions)
-    save_questions(all_questions)
-    
-    # Apply search and tag filters if provided
-    if search_query or filter_tags:
-        filtered_questions = []
-        for question in questions:
-            # Check for tag match if tag filter is applied
-            tags_match = True
-            if filter_tags:
-                question_tags = question.get('tags', [])
-                # Ensure at least one selected tag is in the question's tags
-                tags_match = any(tag in question_tags for tag in filter_tags)
-            
-            # Check for text match if search query is provided
-            text_match = True
-            if search_query:
-                search_lower = search_query.lower()
-                name = question.get('name', '').lower()
-                content = question.get('content', '').lower()
-                
-                text_match = search_lower in name or search_lower in content
-            
-            # Add question if it matches both tag and text criteria
-            if tags_match and text_match:
-                filtered_questions.append(question)
-        
-        questions = filtered_questions
+    return {
+        'questions': page, 'next_page_url': next_page_url(next_cursor),
+        'filter_tags': filter_tags, 'search_query': search_query, 'sort_by': sort_by,
+        'sort_chosen': 'sort_by' in request.args, 'tag_mode': tag_mode, 'tag_counts': get_question_tag_index().facets(matches)
+    }
+
+@app.route('/quizzes/new', methods=['GET', 'POST'])
+def create_quiz():
+    quiz_tags = get_all_quiz_tags()
+    all_tags = get_all_tags()
+    quiz_name = request.args.get('quiz_name', '')
+    selected_quiz_tags = request.args.getlist('selected_tags') or []
     
-    # Sort questions based on sort_by parameter
-    if sort_by == 'rating_asc':
-        questions.sort(key=lambda q: q.get('rating', 0))
-    elif sort_by == 'rating_desc':
-        questions.sort(key=lambda q: q.get('rating', 0), reverse=True)
-    # For 'newest', no sorting needed as it's the default order
+    template_args = dict(list_quiz_questions(), all_quiz_tags=quiz_tags, all_tags=all_tags,
+                         quiz_name=quiz_name, selected_quiz_tags=selected_quiz_tags)
     
     if request.method == 'POST':
         name = request.form.get('quiz_name', '').strip()
         selected_tags = request.form.getlist('selected_tags')
         question_ids = request.form.getlist('question_ids')
         
-        template_args = {
-            'questions': questions, 'all_quiz_tags': quiz_tags, 'all_tags': all_tags,
-            'filter_tags': filter_tags, 'search_query': search_query, 'sort_by': sort_by
-        }
+        template_args.update(quiz_name=name, selected_quiz_tags=selected_tags, selected_question_ids=question_ids)
         
         if not name:
             flash('Quiz name is required!', 'error')
@@ -588,7 +969,6 @@ def create_quiz():
             flash('Please select at least one question for the quiz!', 'error')
             return render_template('create_quiz.html', **template_args)
         
-        quizzes = load_quizzes()
         new_quiz = {
             'id': str(uuid.uuid4()),
             'name': name,
@@ -597,21 +977,17 @@ def create_quiz():
             'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
             'deleted': False
         }
-        quizzes.append(new_quiz)
-        save_quizzes(quizzes)
+        get_request_data().append('quizzes', new_quiz)
         
         flash('Quiz created successfully!', 'success')
         return redirect(url_for('quizzes'))
     
     # For GET requests or if form validation fails
-    return render_template('create_quiz.html', 
-                          questions=questions, all_quiz_tags=quiz_tags, all_tags=all_tags,
-                          filter_tags=filter_tags, search_query=search_query, sort_by=sort_by)
+    return render_template('create_quiz.html', **template_args)
 
 @app.route('/quizzes/<quiz_id>/edit', methods=['GET', 'POST'])
 def edit_quiz(quiz_id):
-    quizzes = load_quizzes()
-    quiz = next((q for q in quizzes if q.get('id') == quiz_id), None)
+    quiz = load_quiz(quiz_id)
     
     if not quiz:
         flash('Quiz not found!', 'error')
@@ -623,22 +999,13 @@ def edit_quiz(quiz_id):
     
     all_tags = get_all_tags()
     all_quiz_tags = get_all_quiz_tags()
-    all_questions = load_questions(include_deleted=True)
-    
-    # Filter out deleted questions for display
-    questions = [q for q in all_questions if not q.get('deleted', False)]
-    
-    # Generate SVGs for questions
-    generate_question_svgs(questions)
-    save_questions(all_questions)
+    template_args = dict(list_quiz_questions(), quiz=quiz, all_quiz_tags=all_quiz_tags, all_tags=all_tags)
     
     if request.method == 'POST':
         name = request.form.get('quiz_name', '').strip()
         selected_tags = request.form.getlist('selected_tags')
         question_ids = request.form.getlist('question_ids')
         
-        template_args = {'quiz': quiz, 'questions': questions, 'all_quiz_tags': all_quiz_tags, 'all_tags': all_tags}
-        
         if not name:
             flash('Quiz name is required!', 'error')
             return render_template('create_quiz.html', **template_args)
@@ -652,17 +1019,16 @@ def edit_quiz(quiz_id):
         quiz['tags'] = selected_tags
         quiz['question_ids'] = question_ids
         
-        save_quizzes(quizzes)
+        save_quiz(quiz)
         flash('Quiz updated successfully!', 'success')
         return redirect(url_for('quizzes'))
     
-    return render_template('create_quiz.html', 
-                          quiz=quiz, questions=questions, all_quiz_tags=all_quiz_tags, all_tags=all_tags)
+    return render_template('create_quiz.html', **template_args)
 
 @app.route('/quizzes/<quiz_id>/attempt')
+@conditional_page('quizzes', 'questions', 'tags', 'submissions')
 def attempt_quiz(quiz_id):
-    quizzes = load_quizzes()
-    quiz = next((q for q in quizzes if q['id'] == quiz_id), None)
+    quiz = load_quiz(quiz_id)
 
     if not quiz:
         flash('Quiz not found.', 'danger')
@@ -672,24 +1038,18 @@ def attempt_quiz(quiz_id):
         flash('This quiz has been deleted and cannot be attempted.', 'danger')
         return redirect(url_for('quizzes'))
 
-    all_questions = load_questions(include_deleted=True)
-    quiz_questions = [q for q in all_questions if q['id'] in quiz['question_ids']]
+    question_ids = set(quiz['question_ids'])
+    quiz_questions = [q for q in load_questions(include_deleted=True) if q['id'] in question_ids]
     
     # Generate SVGs for questions
     generate_question_svgs(quiz_questions)
-    save_questions(all_questions)
     
     # Calculate progress - only count questions completed in this specific quiz
-    all_submissions = load_submissions()
-    
-    # Get all correct submissions for this quiz
-    correct_submissions = [
-        s for s in all_submissions 
-        if s.get('outcome') == 'Correct' and s.get('quiz_id') == quiz_id
-    ]
-    
     # Get unique question IDs that have been correctly answered in this quiz
-    completed_question_ids = set(s['question_id'] for s in correct_submissions)
+    completed_question_ids = set(
+        s['question_id'] for s in find_submissions('quiz_id', quiz_id)
+        if s.get('outcome') == 'Correct'
+    )
     
     # Calculate progress percentage
     total_questions = len(quiz_questions)
@@ -786,8 +1146,6 @@ def add_question():
     all_tags = get_all_tags()
     
     if form.validate_on_submit():
-        questions = load_questions(include_deleted=True)
-        
         # Get selected tag IDs from the form
         selected_tag_ids = request.form.getlist('selected_tags')
         
@@ -799,9 +1157,6 @@ def add_question():
         # Generate unique ID for the question
         question_id = str(uuid.uuid4())
         
-        # We'll generate the SVG later when viewing the question
-        latex_svg = ''
-        
         # Process and save any URL attachments
         urls = request.form.getlist('attachment_url')
         url_attachments = []
@@ -844,13 +1199,14 @@ def add_question():
             'name': form.name.data,
             'content': form.content.data,
             'answer': form.answer.data,
-            'svg': latex_svg,
+            'svg_hash': None,
             'svg_generated': False,  # Flag to indicate SVG needs to be generated
             'rating': float(form.rating.data),  # Convert Decimal to float
             'tags': selected_tag_ids,
             'deleted': False,
             'attachments': url_attachments,
-            'hints': hints  # Add hints to the question model
+            'hints': hints,  # Add hints to the question model
+            'created_at': time.strftime('%Y-%m-%d %H:%M:%S')
         }
         
         # Process file uploads if any
@@ -881,14 +1237,14 @@ def add_question():
             # Add file attachments to question
             new_question['attachments'].extend(file_attachments)
         
-        questions.append(new_question)
-        save_questions(questions)
+        save_question(new_question)
         flash('Question added successfully!', 'success')
         return redirect(url_for('questionbank'))
     
     return render_template('add_question.html', form=form, attachment_form=attachment_form, all_tags=all_tags)
 
 @app.route('/question/<question_id>')
+@conditional_page('questions', 'tags')
 def view_question(question_id):
     question = get_question_or_404(question_id, include_deleted=True)
     if not question:
@@ -904,7 +1260,7 @@ def view_question(question_id):
     
     # Generate SVG if needed
     if generate_question_svg(question):
-        update_question_in_list(question_id, question)
+        save_question_svgs([question])
     
     return render_template('view_question.html', 
                           question=question, creating_quiz=creating_quiz, quiz_name=quiz_name,
@@ -964,7 +1320,6 @@ def attempt_question(question_id):
         # Simple string comparison
         is_correct = user_answer.lower() == correct_answer.lower()
         
-        submissions = load_submissions()
         new_submission = {
             'id': str(uuid.uuid4()),
             'question_id': question_id,
@@ -976,8 +1331,7 @@ def attempt_question(question_id):
             'hint_data': hint_data,    # Add the enhanced hint data with positions
             'quiz_id': submission_quiz_id  # Track which quiz this submission is from
         }
-        submissions.append(new_submission)
-        save_submissions(submissions)
+        append_submission(new_submission)
         
         flash(new_submission['verdict'], 'success' if is_correct else 'error')
         
@@ -1001,11 +1355,10 @@ def attempt_question(question_id):
 
     # Generate SVG if needed
     if generate_question_svg(question):
-        update_question_in_list(question_id, question)
+        save_question_svgs([question])
     
     # Get submissions for this question
-    all_submissions = load_submissions()
-    question_submissions = [s for s in all_submissions if s['question_id'] == question_id]
+    question_submissions = find_submissions('question_id', question_id)
     question_submissions.sort(key=lambda x: x['timestamp'], reverse=True)
 
     return render_template('attempt_question.html', 
@@ -1050,7 +1403,7 @@ def edit_question(question_id):
         
         # We'll generate the SVG later when viewing the question to speed up the edit page
         # Initially use the old SVG if available
-        latex_svg = question.get('svg', '')
+        svg_hash = question.get('svg_hash')
         
         # Get existing attachments to keep
         kept_attachments = []
@@ -1085,14 +1438,15 @@ def edit_question(question_id):
             'name': form.name.data,
             'content': form.content.data,
             'answer': form.answer.data,
-            'svg': latex_svg,  # Use existing SVG initially
+            'svg_hash': svg_hash,  # Use existing SVG initially
             'svg_generated': False,  # Flag to indicate SVG needs to be generated
             'rating': float(form.rating.data),
             'tags': selected_tag_ids,
             'deleted': False,
             'edited_from': question_id,  # Reference to the original question
             'attachments': kept_attachments,
-            'hints': question.get('hints', [])  # Preserve hints from the original question
+            'hints': question.get('hints', []),  # Preserve hints from the original question
+            'created_at': time.strftime('%Y-%m-%d %H:%M:%S')
         }
         
         # Process new file uploads if any
@@ -1152,9 +1506,7 @@ def edit_question(question_id):
                     return render_template('edit_question.html', form=form, attachment_form=attachment_form, 
                                           question=question, all_tags=all_tags)
         
-        questions = load_questions(include_deleted=True)
-        questions.append(new_question)
-        save_questions(questions)
+        save_question(new_question)
         flash('Question updated successfully!', 'success')
         return redirect(url_for('view_question', question_id=new_question_id))
     
@@ -1166,8 +1518,7 @@ def delete_question(question_id):
     
     if question:
         # Mark the question as deleted instead of removing it
-        question['deleted'] = True
-        update_question_in_list(question_id, question)
+        modify_question(question_id, lambda q: q.update(deleted=True))
         flash('Question deleted successfully!', 'success')
     
     return redirect(url_for('questionbank'))
@@ -1217,7 +1568,7 @@ def remove_attachment(question_id, attachment_id):
             if os.path.exists(file_path):
                 os.remove(file_path)
         
-        update_question_in_list(question_id, question)
+        modify_question(question_id, lambda q: q.update(attachments=[a for a in q.get('attachments', []) if a.get('id') != attachment_id]))
         flash('Attachment removed successfully!', 'success')
     else:
         flash('Attachment not found!', 'error')
@@ -1227,7 +1578,7 @@ def remove_attachment(question_id, attachment_id):
 @app.route('/api/tags', methods=['GET', 'POST', 'PUT', 'DELETE'])
 def manage_tags():
     """API endpoint to manage tags"""
-    return handle_tag_management(request, load_tags, save_tags)
+    return handle_tag_management(request, 'tags')
 
 # Make tag helper functions available in templates
 @app.context_processor
@@ -1236,9 +1587,19 @@ def inject_tag_helpers():
         'get_tag_by_id': get_tag_by_id,
         'get_tag_display_name': get_tag_display_name,
         'get_quiz_tag_by_id': get_quiz_tag_by_id,
-        'get_quiz_tag_display_name': get_quiz_tag_display_name
+        'get_quiz_tag_display_name': get_quiz_tag_display_name,
+        'question_svg_src': question_svg_src,
+        'question_svg_rendering': question_svg_rendering
     }
 
+@app.errorhandler(StaleDataError)
+def handle_stale_data(error):
+    """Another worker saved the same data first: ask the user to retry instead of losing their write"""
+    if request.path.startswith('/api/'):
+        return jsonify({'success': False, 'error': str(error)}), 409
+    flash(str(error), 'error')
+    return redirect(request.referrer or url_for('questionbank'))
+
 allowed_file = lambda filename: '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
 def validate_file_uploads(files):
@@ -1306,15 +1667,14 @@ def add_hint(question_id):
         }
 
         # Add the hint to the question
-        if 'hints' not in question:
-            question['hints'] = []
-        question['hints'].append(new_hint)
-        update_question_in_list(question_id, question)
+        modify_question(question_id, lambda q: q.setdefault('hints', []).append(new_hint))
 
         return jsonify({
             'success': True,
             'hint': new_hint
         })
+    except StaleDataError as e:
+        return jsonify({'success': False, 'error': str(e)}), 409
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -1344,12 +1704,18 @@ def update_hint(question_id, hint_id):
         if 'weight' in data:
             hint['weight'] = weight
 
-        update_question_in_list(question_id, question)
+        def update(question):
+            stored_hint = get_item_by_id(question.get('hints', []), hint_id)
+            if stored_hint:
+                stored_hint.update(hint)
+        modify_question(question_id, update)
 
         return jsonify({
             'success': True,
             'hint': hint
         })
+    except StaleDataError as e:
+        return jsonify({'success': False, 'error': str(e)}), 409
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -1365,34 +1731,34 @@ def delete_hint(question_id, hint_id):
             return jsonify({'success': False, 'error': 'Hint not found'}), 404
 
         # Remove the hint
-        question['hints'].remove(hint)
-        update_question_in_list(question_id, question)
+        modify_question(question_id, lambda q: q.update(hints=[h for h in q.get('hints', []) if h.get('id') != hint_id]))
 
         return jsonify({
             'success': True
         })
+    except StaleDataError as e:
+        return jsonify({'success': False, 'error': str(e)}), 409
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/quiz_tags', methods=['GET', 'POST', 'PUT', 'DELETE'])
 def manage_quiz_tags():
     """API endpoint to manage quiz tags"""
-    return handle_tag_management(request, load_quiz_tags, save_quiz_tags, is_quiz_tags=True) 
+    return handle_tag_management(request, 'quiz_tags', is_quiz_tags=True) 
 
 @app.route('/quizzes/<quiz_id>/<action>', methods=['GET', 'POST'])
 def quiz_action(quiz_id, action):
-    quizzes = load_quizzes()
-    quiz = next((q for q in quizzes if q['id'] == quiz_id), None)
+    quiz = load_quiz(quiz_id)
     
     if not quiz:
         flash('Quiz not found.', 'danger')
     elif action == 'delete':
         quiz['deleted'] = True
-        save_quizzes(quizzes)
+        save_quiz(quiz)
         flash('Quiz deleted successfully.', 'success')
     elif action == 'restore':
         quiz['deleted'] = False
-        save_quizzes(quizzes)
+        save_quiz(quiz)
         flash('Quiz restored successfully.', 'success')
     
     return redirect(url_for('quizzes')) 
@@ -0,0 +1,73 @@
+import os
+import signal
+import subprocess
+from collections import namedtuple
+
+try:
+    import resource
+except ImportError:  # Windows: only the wall-clock timeout applies
+    resource = None
+
+# Limits for one external command: wall-clock seconds, CPU seconds, address space and
+# largest file it may write (bytes), and whether TeX may run shell commands
+SandboxLimits = namedtuple('SandboxLimits', ['timeout', 'cpu_seconds', 'memory_bytes', 'output_bytes', 'shell_escape'])
+
+DEFAULT_LIMITS = SandboxLimits(timeout=30, cpu_seconds=20, memory_bytes=1024 * 1024 * 1024,
+                               output_bytes=64 * 1024 * 1024, shell_escape=False)
+
+class SandboxKilled(Exception):
+    """The command was stopped for exceeding one of its limits"""
+
+    def __init__(self, reason):
+        super().__init__(f"Stopped: {reason}")
+        self.reason = reason
+
+def _apply_rlimits(limits):
+    def apply():
+        # Python ignores SIGXFSZ and exec keeps that; restore it so oversized output kills the command
+        if hasattr(signal, 'SIGXFSZ'):
+            signal.signal(signal.SIGXFSZ, signal.SIG_DFL)
+        resource.setrlimit(resource.RLIMIT_CPU, (limits.cpu_seconds, limits.cpu_seconds + 1))
+        resource.setrlimit(resource.RLIMIT_AS, (limits.memory_bytes, limits.memory_bytes))
+        resource.setrlimit(resource.RLIMIT_FSIZE, (limits.output_bytes, limits.output_bytes))
+    return apply
+
+# Signals the kernel sends when an rlimit is hit
+_LIMIT_SIGNALS = {
+    getattr(signal, 'SIGXCPU', None): 'CPU time limit exceeded',
+    getattr(signal, 'SIGXFSZ', None): 'output size limit exceeded',
+    getattr(signal, 'SIGKILL', None): 'killed after exceeding a resource limit',
+}
+
+def run_sandboxed(command, limits=None, timeout_scale=1):
+    """Run a command with rlimits and a wall-clock timeout, returning the CompletedProcess.
+
+    The command runs in its own process group, which is killed as a whole on
+    timeout. Raises SandboxKilled if it ran out of time, CPU or output space.
+    """
+    limits = limits or DEFAULT_LIMITS
+    timeout = limits.timeout * timeout_scale
+    process = subprocess.Popen(
+        command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, start_new_session=True,
+        preexec_fn=_apply_rlimits(limits._replace(cpu_seconds=limits.cpu_seconds * timeout_scale)) if resource else None
+    )
+    try:
+        stdout, stderr = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        _kill_group(process)
+        process.communicate()
+        raise SandboxKilled(f"time limit of {timeout:g}s exceeded")
+    except BaseException:
+        _kill_group(process)
+        process.wait()
+        raise
+
+    if process.returncode < 0 and -process.returncode in _LIMIT_SIGNALS:
+        raise SandboxKilled(_LIMIT_SIGNALS[-process.returncode])
+    return subprocess.CompletedProcess(command, process.returncode, stdout, stderr)
+
+def _kill_group(process):
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError, AttributeError):
+        process.kill()
@@ -0,0 +1,157 @@
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+from bisect import bisect_left
+
+# LaTeX commands (\frac, \{), runs of letters/digits, and single math symbols
+_TOKEN = re.compile(r'\\[a-zA-Z]+|\\[^a-zA-Z\s]|[^\W_]+|[=+\-*/<>^_|!]')
+
+# The last query term also matches longer terms starting with it (search-as-you-type),
+# once it is this long, expanded to at most this many terms
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_TERMS = 64
+
+def tokenize(text):
+    """Split name or LaTeX text into lowercase search terms.
+
+    A command yields both its own term and its bare name, so `\\frac` is found
+    by searching for either "\\frac" or "frac".
+    """
+    tokens = _TOKEN.findall(text.lower())
+    return tokens + [token[1:] for token in tokens if token[0] == '\\' and len(token) > 2]
+
+class SearchIndex:
+    """Inverted index over item names and content, ranked with BM25.
+
+    `sync(version, items)` brings the index up to date with a store: it does
+    nothing while the store version is unchanged, and otherwise re-tokenizes
+    only the items whose name or content changed and drops removed ones, so
+    edits made by any worker process are picked up without a full rebuild.
+    Name terms count `name_weight` times.
+    """
+
+    def __init__(self, name_weight=2, k1=1.2, b=0.75):
+        self.name_weight = name_weight
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._version = None
+        self._documents = {}  # item id -> (name, content) as indexed
+        self._lengths = {}  # item id -> weighted term count
+        self._total_length = 0
+        self._postings = {}  # term -> {item id: weighted term frequency}
+        self._terms = None  # every term, sorted, for prefix lookups; rebuilt lazily after changes
+
+    @property
+    def version(self):
+        return self._version
+
+    def sync(self, version, items):
+        with self._lock:
+            if version is not None and version == self._version:
+                return
+            seen = set()
+            for item in items:
+                item_id = item.get('id')
+                seen.add(item_id)
+                document = (item.get('name', ''), item.get('content', ''))
+                if self._documents.get(item_id) != document:
+                    self._remove(item_id)
+                    self._add(item_id, document)
+            for item_id in [item_id for item_id in self._documents if item_id not in seen]:
+                self._remove(item_id)
+            self._version = version
+
+    def _add(self, item_id, document):
+        name, content = document
+        frequencies = Counter(tokenize(content))
+        for token in tokenize(name):
+            frequencies[token] += self.name_weight
+        for term, frequency in frequencies.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                self._terms = None
+            postings[item_id] = frequency
+        self._documents[item_id] = document
+        self._lengths[item_id] = sum(frequencies.values())
+        self._total_length += self._lengths[item_id]
+
+    def _remove(self, item_id):
+        document = self._documents.pop(item_id, None)
+        if document is None:
+            return
+        self._total_length -= self._lengths.pop(item_id)
+        for term in set(tokenize(document[0]) + tokenize(document[1])):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(item_id, None)
+            if not postings:
+                del self._postings[term]
+                self._terms = None
+
+    def _expand(self, term, prefix):
+        """Terms a query term matches: itself, plus longer terms it starts if it is the last one"""
+        terms = [term] if term in self._postings else []
+        if prefix and len(term) >= MIN_PREFIX_LENGTH:
+            if self._terms is None:
+                self._terms = sorted(self._postings)
+            index = bisect_left(self._terms, term)
+            while index < len(self._terms) and self._terms[index].startswith(term) and len(terms) <= MAX_PREFIX_TERMS:
+                if self._terms[index] != term:
+                    terms.append(self._terms[index])
+                index += 1
+        return terms
+
+    def search(self, query, candidates=None, limit=None, with_scores=False):
+        """Return the ids of items matching every query term, best first.
+
+        `candidates` restricts the results to a set of ids (e.g. the
+        non-deleted questions); `limit` keeps only the top results.
+        With `with_scores`, (id, score) pairs are returned instead.
+        """
+        query_terms = list(dict.fromkeys(tokenize(query)))
+        if not query_terms:
+            return []
+        with self._lock:
+            groups = [self._expand(term, prefix=index == len(query_terms) - 1) for index, term in enumerate(query_terms)]
+            if not all(groups):
+                return []
+            # Intersect the groups' postings, smallest first
+            matches = []
+            for terms in groups:
+                ids = set()
+                for term in terms:
+                    ids.update(self._postings[term])
+                matches.append(ids)
+            matches.sort(key=len)
+            result = set(candidates).intersection(matches[0]) if candidates is not None else set(matches[0])
+            for ids in matches[1:]:
+                result &= ids
+                if not result:
+                    return []
+
+            count = len(self._documents)
+            average_length = self._total_length / count if count else 1
+            scores = dict.fromkeys(result, 0.0)
+            for term in {term for terms in groups for term in terms}:
+                postings = self._postings[term]
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for item_id in result:
+                    frequency = postings.get(item_id)
+                    if frequency:
+                        norm = self.k1 * (1 - self.b + self.b * self._lengths[item_id] / average_length)
+                        scores[item_id] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        if limit is not None:
+            ranked = heapq.nlargest(limit, scores.items(), key=lambda pair: pair[1])
+        else:
+            ranked = sorted(scores.items(), key=lambda pair: pair[1], reverse=True)
+        return ranked if with_scores else [item_id for item_id, _ in ranked]
+
+    def stats(self):
+        with self._lock:
+            return {'documents': len(self._documents), 'terms': len(self._postings), 'version': str(self._version)}
@@ -0,0 +1,79 @@
+import threading
+from bisect import bisect_left, insort
+
+class SortIndex:
+    """Store items kept sorted under named orders, so listings page through them without sorting.
+
+    `orders` maps an order name to a key function; keys must be unique per
+    item (end them with the id) and JSON-serializable, as they double as
+    pagination cursors. Like the other indexes, `sync(version, items)` only
+    moves the items whose key changed since the last store version.
+    """
+
+    def __init__(self, orders):
+        self.orders = orders
+        self._lock = threading.Lock()
+        self._version = None
+        self._keys = {name: {} for name in orders}  # order -> item id -> key
+        self._sorted = {name: [] for name in orders}  # order -> (key, id) in ascending order
+
+    @property
+    def version(self):
+        return self._version
+
+    def sync(self, version, items):
+        with self._lock:
+            if version is not None and version == self._version:
+                return
+            for name, key in self.orders.items():
+                keys = {item.get('id'): tuple(key(item)) for item in items}
+                old_keys = self._keys[name]
+                changed = [item_id for item_id in keys.keys() | old_keys.keys() if keys.get(item_id) != old_keys.get(item_id)]
+                if len(changed) > len(keys) // 4:
+                    # Cheaper to sort everything again than to move this many
+                    self._sorted[name] = sorted((item_key, item_id) for item_id, item_key in keys.items())
+                else:
+                    entries = self._sorted[name]
+                    for item_id in changed:
+                        if item_id in old_keys:
+                            del entries[bisect_left(entries, (old_keys[item_id], item_id))]
+                        if item_id in keys:
+                            insort(entries, (keys[item_id], item_id))
+                self._keys[name] = keys
+            self._version = version
+
+    def page(self, name, after=None, reverse=False, candidates=None, size=20):
+        """Return (ids, next_key): up to `size` ids following the key `after` in an order.
+
+        Only ids in `candidates` are returned if it is given; next_key is the
+        key of the last id returned, or None if nothing follows it.
+        """
+        with self._lock:
+            entries = self._sorted[name]
+            # (key,) sorts just before the entry (key, id), so this finds the cursor's position
+            try:
+                position = None if after is None else bisect_left(entries, (tuple(after),))
+            except TypeError:  # Not a key of this order
+                position = None
+            if reverse:
+                index = len(entries) - 1 if position is None else position - 1
+                step = -1
+            else:
+                index = 0 if position is None else position
+                if position is not None and index < len(entries) and entries[index][0] == tuple(after):
+                    index += 1
+                step = 1
+            page = []
+            while 0 <= index < len(entries):
+                item_key, item_id = entries[index]
+                index += step
+                if candidates is not None and item_id not in candidates:
+                    continue
+                if len(page) == size:
+                    return [item_id for _, item_id in page], list(page[-1][0])
+                page.append((item_key, item_id))
+            return [item_id for _, item_id in page], None
+
+    def stats(self):
+        with self._lock:
+            return {'items': len(next(iter(self._keys.values()), {})), 'orders': list(self.orders), 'version': str(self._version)}
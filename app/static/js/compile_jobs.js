@@ -0,0 +1,61 @@
+// Compile LaTeX previews through the background job API: one job at a time per editor,
+// results delivered by server-sent events, or by polling where EventSource is unavailable
+const compileJobs = (function() {
+    const editorId = Math.random().toString(36).slice(2) + Date.now().toString(36);
+    let currentJob = null;
+
+    function waitForJob(jobId) {
+        return new Promise((resolve, reject) => {
+            function poll(delay) {
+                setTimeout(() => {
+                    fetch(`/api/compile-jobs/${jobId}`)
+                        .then(response => response.json())
+                        .then(data => data.status === 'pending' ? poll(Math.min(delay * 1.5, 3000)) : resolve(data))
+                        .catch(reject);
+                }, delay);
+            }
+
+            if (!window.EventSource) {
+                poll(300);
+                return;
+            }
+            const events = new EventSource(`/api/compile-jobs/${jobId}/events`);
+            events.onmessage = event => {
+                events.close();
+                const data = JSON.parse(event.data);
+                data.status === 'pending' ? poll(1000) : resolve(data);
+            };
+            events.onerror = () => {
+                events.close();
+                poll(300);
+            };
+        });
+    }
+
+    // Resolves with the finished job ({svg, ...}); rejects if superseded by a newer compile
+    function compile(latex) {
+        return fetch('/api/compile-jobs', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({latex: latex, editor_id: editorId})
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (!data.job_id || data.status !== 'pending') {
+                return data;
+            }
+            currentJob = data.job_id;
+            return waitForJob(data.job_id);
+        })
+        .then(data => {
+            if (data.status === 'cancelled' || (data.job_id && currentJob && data.job_id !== currentJob)) {
+                throw new DOMException('Superseded by a newer compile', 'AbortError');
+            }
+            return data;
+        });
+    }
+
+    return {compile: compile};
+})();
@@ -0,0 +1,75 @@
+// Paginated listings: a "Load more" link with data-next-page="<list id>" fetches the next page
+// and appends its items to the list; it loads by itself once scrolled into view.
+const infiniteScroll = (function() {
+    function fetchPage(url) {
+        return fetch(url, { headers: { 'X-Requested-With': 'fetch' } })
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`Loading ${url} failed with ${response.status}`);
+                }
+                return response.text();
+            })
+            .then(html => new DOMParser().parseFromString(html, 'text/html'));
+    }
+
+    // Copy a fetched page's items (and its next-page link) into the list with the same id
+    function insertPage(doc, listId, replace) {
+        const list = document.getElementById(listId);
+        const fetchedList = doc.getElementById(listId);
+        if (!list || !fetchedList) {
+            return;
+        }
+        if (replace) {
+            list.replaceChildren();
+        }
+        list.append(...Array.from(fetchedList.children, child => document.importNode(child, true)));
+
+        const link = document.querySelector(`[data-next-page="${listId}"]`);
+        const fetchedLink = doc.querySelector(`[data-next-page="${listId}"]`);
+        if (link && fetchedLink && !fetchedLink.hidden) {
+            link.href = fetchedLink.href;
+            link.classList.remove('disabled');
+            link.hidden = false;
+        } else if (link) {
+            link.hidden = true;
+        }
+        document.dispatchEvent(new CustomEvent('page-items-added', { detail: { list: list } }));
+    }
+
+    function loadNext(link) {
+        if (link.classList.contains('disabled') || link.hidden) {
+            return;
+        }
+        link.classList.add('disabled');
+        fetchPage(link.href)
+            .then(doc => {
+                insertPage(doc, link.dataset.nextPage, false);
+                // The observer only fires on changes, so keep going while the link is still in reach
+                if (!link.hidden && link.getBoundingClientRect().top < window.innerHeight + 600) {
+                    loadNext(link);
+                }
+            })
+            .catch(() => link.classList.remove('disabled'));
+    }
+
+    document.addEventListener('DOMContentLoaded', function() {
+        document.querySelectorAll('[data-next-page]').forEach(link => {
+            link.addEventListener('click', function(event) {
+                event.preventDefault();
+                loadNext(link);
+            });
+            if ('IntersectionObserver' in window) {
+                new IntersectionObserver(entries => {
+                    if (entries.some(entry => entry.isIntersecting)) {
+                        loadNext(link);
+                    }
+                }, { rootMargin: '600px' }).observe(link);
+            }
+        });
+    });
+
+    return {
+        // Replace a list with the first page of another listing URL (e.g. new filters)
+        reload: (url, listId) => fetchPage(url).then(doc => insertPage(doc, listId, true))
+    };
+})();
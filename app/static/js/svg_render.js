@@ -0,0 +1,51 @@
+// Question SVGs rendered in the background: poll until they are ready, then swap them in
+document.addEventListener('DOMContentLoaded', function() {
+    function pendingImages() {
+        return document.querySelectorAll('img[data-rendering-question-id]');
+    }
+
+    let polling = false;
+
+    function poll(delay) {
+        polling = true;
+        setTimeout(function() {
+            const images = pendingImages();
+            if (!images.length) {
+                polling = false;
+                return;
+            }
+
+            const params = new URLSearchParams();
+            new Set(Array.from(images, img => img.dataset.renderingQuestionId)).forEach(id => params.append('ids', id));
+
+            fetch(`/api/questions/svg-status?${params}`)
+                .then(response => response.json())
+                .then(statuses => {
+                    images.forEach(img => {
+                        const status = statuses[img.dataset.renderingQuestionId];
+                        if (status && status.state !== 'rendering') {
+                            if (status.src) {
+                                img.src = status.src;
+                            }
+                            if (status.state === 'failed' && status.error) {
+                                img.title = status.error;
+                            }
+                            img.removeAttribute('data-rendering-question-id');
+                        }
+                    });
+                    // Back off slowly while renders are still running
+                    poll(Math.min(delay * 1.5, 10000));
+                })
+                .catch(() => poll(10000));
+        }, delay);
+    }
+
+    poll(1000);
+
+    // Pages of a listing loaded later may bring new pending images
+    document.addEventListener('page-items-added', function() {
+        if (!polling) {
+            poll(1000);
+        }
+    });
+});
@@ -0,0 +1,384 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from decimal import Decimal
+from app.locking import atomic_write, file_lock
+from app.repository import clone_item, file_signature, get_repository
+from app.submission_log import get_submission_log
+
+# Data stores and the config key of the JSON file backing each one
+STORE_FILES = {
+    'questions': 'QUESTIONS_FILE',
+    'quizzes': 'QUIZZES_FILE',
+    'tags': 'TAGS_FILE',
+    'quiz_tags': 'QUIZ_TAGS_FILE',
+    'submissions': 'SUBMISSIONS_LOG_FILE',
+}
+
+# Stores whose items get a `seq` number when first stored, increasing in insertion order
+SEQUENCED_STORES = ('questions', 'quizzes')
+
+# Backend instances, shared per configuration
+_backends = {}
+_backends_lock = threading.Lock()
+
+# Custom JSON encoder to handle Decimal objects
+class DecimalEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return float(obj)
+        return super(DecimalEncoder, self).default(obj)
+
+class StaleDataError(Exception):
+    """Raised when data changed in storage after it was loaded for modification"""
+
+    def __init__(self, message='This item was changed by someone else in the meantime. Please reload and try again.'):
+        super().__init__(message)
+
+def apply_upsert(items, item, next_seq=None):
+    """Replace the item with the same id in a list, or append it.
+
+    Items carry a `version` counter: saving a copy whose version no longer
+    matches the stored one raises StaleDataError instead of silently
+    overwriting the other writer's change. A new item is given `next_seq`
+    as its `seq` if it has none.
+    """
+    for i, existing in enumerate(items):
+        if existing.get('id') == item.get('id'):
+            if existing.get('version', 0) != item.get('version', 0):
+                raise StaleDataError()
+            item['version'] = item.get('version', 0) + 1
+            items[i] = item
+            return
+    item['version'] = item.get('version', 0) + 1
+    if next_seq is not None:
+        item.setdefault('seq', next_seq)
+    items.append(item)
+
+def bump_changed_versions(items, original):
+    """Bump the `version` of every item added or changed since `original`, so stale copies of them are rejected"""
+    before = {item.get('id'): item for item in original if item.get('id') is not None}
+    for item in items:
+        previous = before.get(item.get('id'))
+        if previous is None:
+            item.setdefault('version', 1)
+        elif item != previous:
+            item['version'] = previous.get('version', 0) + 1
+
+def next_sequence(items):
+    """The `seq` for an item added after the given ones"""
+    return max((item.get('seq') or 0 for item in items), default=0) + 1
+
+class JsonStorage:
+    """Whole-file JSON storage: one file per store, submissions in an append-only log.
+
+    Writes go through a temp file and an atomic rename while holding a
+    cross-process lock on the file, so several worker processes can share
+    the data directory.
+    """
+
+    name = 'json'
+
+    def __init__(self, config):
+        self.paths = {store: config.get(key) for store, key in STORE_FILES.items()}
+        self.submissions_log = get_submission_log(
+            self.paths['submissions'], legacy_path=config.get('SUBMISSIONS_FILE'),
+            fsync_batch=config.get('SUBMISSIONS_FSYNC_BATCH', 32),
+            fsync_interval=config.get('SUBMISSIONS_FSYNC_INTERVAL', 1.0))
+
+    def iter(self, store):
+        if store == 'submissions':
+            return self.submissions_log.iter_records()
+        return iter(self.load(store))
+
+    def load(self, store):
+        if store == 'submissions':
+            return list(self.submissions_log.iter_records())
+        repository = get_repository(self.paths[store])
+        return repository.all() if repository.exists() else []
+
+    def load_versioned(self, store):
+        """Return (version, items); pass the version back to save() to detect concurrent writes"""
+        if store == 'submissions':
+            with file_lock(self.paths[store], shared=True):
+                return self.version(store), self.load(store)
+        version, items = get_repository(self.paths[store]).snapshot()
+        return version, items if version is not None else []
+
+    def version(self, store):
+        return file_signature(self.paths[store])
+
+    def get(self, store, item_id):
+        if store == 'submissions':
+            return next((s for s in self.submissions_log.iter_records() if s.get('id') == item_id), None)
+        return get_repository(self.paths[store]).get(item_id)
+
+    def find(self, store, field, value):
+        """Items whose `field` equals `value`, in store order"""
+        return [item for item in self.iter(store) if item.get(field) == value]
+
+    def _write(self, store, items):
+        if store == 'submissions':
+            self.submissions_log.rewrite(items)
+            return
+        file_path = self.paths[store]
+        atomic_write(file_path, lambda f: json.dump(items, f, indent=4, cls=DecimalEncoder))
+        get_repository(file_path).replace(items)
+
+    def save(self, store, items, expected_version=None):
+        with file_lock(self.paths[store]):
+            if expected_version is not None and self.version(store) != expected_version:
+                raise StaleDataError()
+            self._write(store, items)
+
+    @contextmanager
+    def transaction(self, store):
+        """Load a store under an exclusive lock and save it on exit if it was modified, bumping changed items' versions"""
+        with file_lock(self.paths[store]):
+            items = self.load(store)
+            original = clone_item(items)
+            yield items
+            if items != original:
+                bump_changed_versions(items, original)
+                self._write(store, items)
+
+    def upsert(self, store, item):
+        """Replace the item with the same id, or append it. JSON files are still rewritten whole."""
+        with self.transaction(store) as items:
+            apply_upsert(items, item, next_sequence(items) if store in SEQUENCED_STORES else None)
+
+    def append(self, store, item):
+        if store == 'submissions':
+            self.submissions_log.append(item)
+        else:
+            with self.transaction(store) as items:
+                if store in SEQUENCED_STORES:
+                    item.setdefault('seq', next_sequence(items))
+                items.append(item)
+
+class SqliteStorage:
+    """Embedded SQLite storage: one row per item, so single-item writes touch a single row.
+
+    Each item is kept as a JSON document in `data`; the fields used for
+    lookups and filtering are copied into indexed columns. Every write to a
+    store bumps its counter in `store_versions`.
+    """
+
+    name = 'sqlite'
+
+    # Indexed columns copied out of each item, per store
+    COLUMNS = {
+        'questions': {'deleted': lambda q: int(bool(q.get('deleted', False))), 'rating': lambda q: _to_float(q.get('rating'))},
+        'quizzes': {'deleted': lambda q: int(bool(q.get('deleted', False)))},
+        'tags': {},
+        'quiz_tags': {},
+        'submissions': {'question_id': lambda s: s.get('question_id'), 'quiz_id': lambda s: s.get('quiz_id')},
+    }
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS questions (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT UNIQUE,
+            deleted INTEGER NOT NULL DEFAULT 0, rating REAL, data TEXT NOT NULL);
+        CREATE INDEX IF NOT EXISTS idx_questions_deleted ON questions(deleted);
+        CREATE TABLE IF NOT EXISTS quizzes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT UNIQUE,
+            deleted INTEGER NOT NULL DEFAULT 0, data TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS tags (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT UNIQUE, data TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS quiz_tags (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT UNIQUE, data TEXT NOT NULL);
+        CREATE TABLE IF NOT EXISTS submissions (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT UNIQUE,
+            question_id TEXT, quiz_id TEXT, data TEXT NOT NULL);
+        CREATE INDEX IF NOT EXISTS idx_submissions_question ON submissions(question_id);
+        CREATE INDEX IF NOT EXISTS idx_submissions_quiz ON submissions(quiz_id);
+        CREATE TABLE IF NOT EXISTS store_versions (store TEXT PRIMARY KEY, version INTEGER NOT NULL);
+        CREATE TABLE IF NOT EXISTS store_sequences (store TEXT PRIMARY KEY, seq INTEGER NOT NULL);
+    """
+
+    def __init__(self, config):
+        self.database = config.get('SQLITE_DATABASE')
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(self.database), exist_ok=True)
+        conn = self.connection()
+        conn.executescript(self.SCHEMA)
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO store_versions (store, version) VALUES (?, 0)",
+                             [(store,) for store in STORE_FILES])
+            # Databases created before item sequence numbers start after the highest one already stored
+            for store in SEQUENCED_STORES:
+                conn.execute(f"INSERT OR IGNORE INTO store_sequences (store, seq) "
+                             f"SELECT ?, COALESCE(MAX(json_extract(data, '$.seq')), 0) FROM {store}", (store,))
+
+    def connection(self):
+        """One connection per thread; WAL lets readers run alongside a writer"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.database, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _write_transaction(self):
+        """BEGIN IMMEDIATE takes the database write lock up front, so read-check-write is atomic"""
+        conn = self.connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+    def iter(self, store):
+        for (data,) in self.connection().execute(f"SELECT data FROM {store} ORDER BY seq"):
+            yield json.loads(data)
+
+    def load(self, store):
+        return list(self.iter(store))
+
+    def load_versioned(self, store):
+        conn = self.connection()
+        conn.execute('BEGIN')
+        try:
+            return self.version(store), self.load(store)
+        finally:
+            conn.commit()
+
+    def version(self, store):
+        row = self.connection().execute("SELECT version FROM store_versions WHERE store = ?", (store,)).fetchone()
+        return row[0] if row else 0
+
+    def get(self, store, item_id):
+        row = self.connection().execute(f"SELECT data FROM {store} WHERE id = ?", (item_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def find(self, store, field, value):
+        """Items whose `field` equals `value`, in store order; indexed columns (e.g. submissions by question or quiz) use their index"""
+        column = field if field in self.COLUMNS[store] else f"json_extract(data, '$.{field}')"
+        rows = self.connection().execute(f"SELECT data FROM {store} WHERE {column} = ? ORDER BY seq", (value,))
+        return [json.loads(data) for (data,) in rows]
+
+    def _write_row(self, conn, store, item):
+        columns = self.COLUMNS[store]
+        names = ['id'] + list(columns) + ['data']
+        values = [item.get('id')] + [extract(item) for extract in columns.values()] + [json.dumps(item, cls=DecimalEncoder)]
+        updates = ', '.join(f"{name} = excluded.{name}" for name in names[1:])
+        if item.get('id') is None:
+            conn.execute(f"INSERT INTO {store} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})", values)
+        else:
+            conn.execute(f"INSERT INTO {store} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))}) "
+                         f"ON CONFLICT(id) DO UPDATE SET {updates}", values)
+
+    def _delete_rows(self, conn, store, item_ids):
+        conn.executemany(f"DELETE FROM {store} WHERE id = ?", [(item_id,) for item_id in item_ids])
+
+    def _bump_version(self, conn, store):
+        conn.execute("UPDATE store_versions SET version = version + 1 WHERE store = ?", (store,))
+
+    def _next_sequence(self, conn, store):
+        conn.execute("UPDATE store_sequences SET seq = seq + 1 WHERE store = ?", (store,))
+        return conn.execute("SELECT seq FROM store_sequences WHERE store = ?", (store,)).fetchone()[0]
+
+    def _advance_sequence(self, conn, store, items):
+        """Keep the sequence ahead of the `seq` of items written with one already set"""
+        highest = max((item.get('seq') or 0 for item in items), default=0)
+        conn.execute("UPDATE store_sequences SET seq = MAX(seq, ?) WHERE store = ?", (highest, store))
+
+    def _new_item_sequence(self, conn, store, item):
+        """The `seq` for a new item, or None if the store is not sequenced"""
+        if store not in SEQUENCED_STORES:
+            return None
+        if item.get('seq') is not None:
+            self._advance_sequence(conn, store, [item])
+            return item['seq']
+        return self._next_sequence(conn, store)
+
+    def _save_rows(self, conn, store, items):
+        """Write only the rows that differ from what is stored, and delete missing ones"""
+        existing = dict(conn.execute(f"SELECT id, data FROM {store} WHERE id IS NOT NULL"))
+        changed = conn.execute(f"DELETE FROM {store} WHERE id IS NULL").rowcount > 0
+        seen = set()
+        for item in items:
+            item_id = item.get('id')
+            seen.add(item_id)
+            if item_id is None or existing.get(item_id) != json.dumps(item, cls=DecimalEncoder):
+                self._write_row(conn, store, item)
+                changed = True
+        removed = [item_id for item_id in existing if item_id not in seen]
+        if removed:
+            self._delete_rows(conn, store, removed)
+            changed = True
+        if changed:
+            self._bump_version(conn, store)
+            if store in SEQUENCED_STORES:
+                self._advance_sequence(conn, store, items)
+
+    def save(self, store, items, expected_version=None):
+        with self._write_transaction() as conn:
+            if expected_version is not None and self.version(store) != expected_version:
+                raise StaleDataError()
+            self._save_rows(conn, store, items)
+
+    @contextmanager
+    def transaction(self, store):
+        """Load a store inside a write transaction and save the modified rows on exit, bumping their versions"""
+        with self._write_transaction() as conn:
+            items = self.load(store)
+            original = clone_item(items)
+            yield items
+            bump_changed_versions(items, original)
+            self._save_rows(conn, store, items)
+
+    def upsert(self, store, item):
+        with self._write_transaction() as conn:
+            current = self.get(store, item.get('id')) if item.get('id') is not None else None
+            if current is not None:
+                apply_upsert([current], item)
+            else:
+                apply_upsert([], item, self._new_item_sequence(conn, store, item))
+            self._write_row(conn, store, item)
+            self._bump_version(conn, store)
+
+    def append(self, store, item):
+        with self._write_transaction() as conn:
+            if store in SEQUENCED_STORES:
+                item.setdefault('seq', self._new_item_sequence(conn, store, item))
+            self._write_row(conn, store, item)
+            self._bump_version(conn, store)
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+BACKENDS = {
+    'json': JsonStorage,
+    'sqlite': SqliteStorage,
+}
+
+def get_storage(config, backend=None):
+    """Return the storage backend selected by STORAGE_BACKEND (or the one named)"""
+    backend = backend or config.get('STORAGE_BACKEND', 'json')
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown storage backend '{backend}' (expected one of: {', '.join(BACKENDS)})")
+    paths = tuple(config.get(key) for key in list(STORE_FILES.values()) + ['SQLITE_DATABASE'])
+    with _backends_lock:
+        storage = _backends.get((backend, paths))
+        if storage is None:
+            storage = _backends[(backend, paths)] = BACKENDS[backend](config)
+        return storage
+
+def copy_stores(source, destination):
+    """Copy every store from one backend to another, returning {store: item_count}"""
+    counts = {}
+    for store in STORE_FILES:
+        items = list(source.iter(store))
+        destination.save(store, items)
+        counts[store] = len(items)
+    return counts
@@ -0,0 +1,150 @@
+import atexit
+import json
+import os
+import threading
+from app.locking import atomic_write, file_lock
+
+# Shared logs, one per log file path
+_logs = {}
+_logs_lock = threading.Lock()
+
+class SubmissionLog:
+    """Append-only, line-delimited JSON log of submissions.
+
+    Each answer is one appended line instead of a rewrite of the whole
+    history. Writes are flushed immediately but fsync'd in batches: after
+    `fsync_batch` records or `fsync_interval` seconds, whichever comes first.
+    """
+
+    def __init__(self, log_path, legacy_path=None, fsync_batch=32, fsync_interval=1.0):
+        self.log_path = log_path
+        self.legacy_path = legacy_path
+        self.fsync_batch = fsync_batch
+        self.fsync_interval = fsync_interval
+        self._lock = threading.RLock()
+        self._fd = None
+        self._unsynced = 0
+        self._sync_timer = None
+        self._migrate_legacy()
+
+    def _migrate_legacy(self):
+        """One-time import of the old submissions.json array into the log"""
+        if os.path.exists(self.log_path) or not self.legacy_path or not os.path.exists(self.legacy_path):
+            return
+        with file_lock(self.log_path):
+            # Another worker may have migrated (and appended) while we waited
+            if os.path.exists(self.log_path):
+                return
+            with open(self.legacy_path, 'r') as f:
+                records = json.load(f)
+            self._write_all(records)
+
+    def _write_all(self, records):
+        """Atomically replace the log with the given records"""
+        def write(f):
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+        atomic_write(self.log_path, write)
+
+    def _open(self):
+        """Return an append handle, reopening it if the log was replaced by a compaction"""
+        if self._fd is not None:
+            try:
+                current = os.stat(self.log_path)
+                opened = os.fstat(self._fd)
+                if (current.st_ino, current.st_dev) == (opened.st_ino, opened.st_dev):
+                    return self._fd
+            except OSError:
+                pass
+            self._close()
+        os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+        self._fd = os.open(self.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        return self._fd
+
+    def _close(self):
+        if self._fd is not None:
+            self._sync()
+            os.close(self._fd)
+            self._fd = None
+
+    def _sync(self):
+        if self._sync_timer is not None:
+            self._sync_timer.cancel()
+            self._sync_timer = None
+        if self._fd is not None and self._unsynced:
+            os.fsync(self._fd)
+            self._unsynced = 0
+
+    def sync(self):
+        """Force any batched writes to disk"""
+        with self._lock:
+            self._sync()
+
+    def append(self, record):
+        """Append one record; a single write() so concurrent appenders never interleave lines"""
+        line = (json.dumps(record) + "\n").encode('utf-8')
+        # Appenders share the lock; a compaction takes it exclusively so no append is lost mid-rewrite
+        with self._lock, file_lock(self.log_path, shared=True):
+            os.write(self._open(), line)
+            self._unsynced += 1
+            if self._unsynced >= self.fsync_batch:
+                self._sync()
+            elif self._sync_timer is None:
+                self._sync_timer = threading.Timer(self.fsync_interval, self.sync)
+                self._sync_timer.daemon = True
+                self._sync_timer.start()
+
+    def iter_records(self):
+        """Stream records from the log, skipping a torn trailing line from an interrupted write"""
+        try:
+            f = open(self.log_path, 'r')
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+    def rewrite(self, records):
+        """Replace the whole log with the given records"""
+        with self._lock, file_lock(self.log_path):
+            self._close()
+            self._write_all(records)
+
+    def compact(self):
+        """Rewrite the log without malformed lines or duplicate ids (the last copy of a record wins).
+
+        Returns (records_before, records_after).
+        """
+        with self._lock, file_lock(self.log_path):
+            self._sync()
+            records = {}
+            anonymous = []
+            total = 0
+            for record in self.iter_records():
+                total += 1
+                if isinstance(record, dict) and record.get('id'):
+                    records[record['id']] = record
+                else:
+                    anonymous.append(record)
+            compacted = anonymous + list(records.values())
+            self.rewrite(compacted)
+            return total, len(compacted)
+
+def get_submission_log(log_path, legacy_path=None, fsync_batch=32, fsync_interval=1.0):
+    """Return the shared submission log for a path"""
+    with _logs_lock:
+        log = _logs.get(log_path)
+        if log is None:
+            log = _logs[log_path] = SubmissionLog(log_path, legacy_path, fsync_batch, fsync_interval)
+        return log
+
+@atexit.register
+def _sync_all_logs():
+    for log in list(_logs.values()):
+        log.sync()
@@ -0,0 +1,73 @@
+import re
+
+# Decimal places kept in coordinates; pdf2svg output is in points, so 3 places is far below a pixel
+SVG_PRECISION = 3
+
+_COMMENT = re.compile(r'<!--.*?-->', re.S)
+_XML_DECLARATION = re.compile(r'<\?xml[^>]*\?>\s*')
+_METADATA = re.compile(r'<(metadata|title|desc)\b[^>]*(/>|>.*?</\1>)', re.S)
+_BETWEEN_TAGS = re.compile(r'>\s+<')
+_WHITESPACE = re.compile(r'\s+')
+_NUMBER = re.compile(r'-?(?:\d+\.\d*|\.\d+|\d+)(?:[eE][-+]?\d+)?')
+_GEOMETRY_ATTRIBUTE = re.compile(r'\b(d|points|transform|viewBox|x|y|width|height)="([^"]*)"')
+# Glyph definitions written by cairo: <symbol id="glyph0-1"> (older) or <g id="glyph-0-1"> (newer)
+_GLYPH = re.compile(r'<(symbol|g)\b([^>]*?)\bid="(glyph[^"]+)"([^>]*)>(.*?)</\1>', re.S)
+_GLYPH_REFERENCE = re.compile(r'(xlink:href|href)="#(glyph[^"]+)"')
+
+def _round_number(match, precision):
+    text = match.group(0)
+    if 'e' in text or 'E' in text:
+        return text
+    value = round(float(text), precision)
+    text = f"{value:.{precision}f}".rstrip('0').rstrip('.')
+    if text in ('-0', ''):
+        return '0'
+    # Leading zeros are optional in SVG numbers
+    if text.startswith('0.'):
+        return text[1:]
+    if text.startswith('-0.'):
+        return '-' + text[2:]
+    return text
+
+def _round_geometry(svg, precision):
+    def attribute(match):
+        values = _NUMBER.sub(lambda number: _round_number(number, precision), match.group(2))
+        values = _WHITESPACE.sub(' ', values).strip()
+        return f'{match.group(1)}="{values}"'
+    return _GEOMETRY_ATTRIBUTE.sub(attribute, svg)
+
+def _dedupe_glyphs(svg):
+    """Point references to identical glyph outlines at one definition and drop the copies and unused glyphs"""
+    canonical = {}  # glyph body -> first id defining it
+    aliases = {}  # glyph id -> canonical id
+    for tag, before, glyph_id, after, body in _GLYPH.findall(svg):
+        aliases[glyph_id] = canonical.setdefault((tag, before, after, body), glyph_id)
+    if not aliases:
+        return svg
+
+    svg = _GLYPH_REFERENCE.sub(lambda m: f'{m.group(1)}="#{aliases.get(m.group(2), m.group(2))}"', svg)
+    used = set(match.group(2) for match in _GLYPH_REFERENCE.finditer(svg))
+
+    def glyph(match):
+        glyph_id = match.group(3)
+        return match.group(0) if aliases[glyph_id] == glyph_id and glyph_id in used else ''
+    return _GLYPH.sub(glyph, svg)
+
+def optimize_svg(svg, precision=SVG_PRECISION):
+    """Shrink pdf2svg output: strip comments and metadata, round coordinates, dedupe glyphs, drop whitespace.
+
+    Returns the input unchanged if anything goes wrong, so a surprising SVG is
+    never lost to the optimizer.
+    """
+    try:
+        optimized = _COMMENT.sub('', svg)
+        optimized = _XML_DECLARATION.sub('', optimized)
+        optimized = _METADATA.sub('', optimized)
+        optimized = _round_geometry(optimized, precision)
+        optimized = _dedupe_glyphs(optimized)
+        optimized = _BETWEEN_TAGS.sub('><', optimized).strip()
+    except Exception:
+        return svg
+    if not optimized.startswith('<svg'):
+        return svg
+    return optimized
@@ -0,0 +1,111 @@
+import base64
+import gzip
+import hashlib
+import os
+import re
+from app.locking import atomic_write
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only gzip copies are stored
+    brotli = None
+
+SVG_DATA_URI_PREFIX = 'data:image/svg+xml;base64,'
+
+# Keys are LaTeX cache keys (hex digests); anything else is rejected before touching the filesystem
+_KEY_PATTERN = re.compile(r'^[0-9a-f]{32,64}$')
+
+svg_data_uri = lambda svg: f"{SVG_DATA_URI_PREFIX}{base64.b64encode(svg.encode()).decode('ascii')}"
+
+def decode_svg_data_uri(uri):
+    """Return the SVG markup inside a base64 data URI, or None if it is not one"""
+    if not uri or not uri.startswith(SVG_DATA_URI_PREFIX):
+        return None
+    return base64.b64decode(uri[len(SVG_DATA_URI_PREFIX):]).decode('utf-8')
+
+# Precompressed copies stored next to each SVG: Content-Encoding -> (file suffix, compress function)
+COMPRESSED_ENCODINGS = {'gzip': ('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))}
+if brotli is not None:
+    COMPRESSED_ENCODINGS = {'br': ('.br', lambda data: brotli.compress(data, mode=brotli.MODE_TEXT)), **COMPRESSED_ENCODINGS}
+
+# Digests of stored SVG files: path -> ((inode, mtime, size), digest), recomputed when the file is replaced
+_digests = {}
+
+class SvgStore:
+    """Store of rendered SVGs, one file per LaTeX hash.
+
+    Files are sharded by the first two hex digits of the key, so questions
+    only need to keep the key. A file is only rewritten by the maintenance
+    commands (a forced re-render or minification); URLs and ETags carry
+    digest(), so they change with the bytes. Each SVG also gets precompressed
+    copies (see COMPRESSED_ENCODINGS) so it can be served compressed without
+    per-request work.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+
+    def path(self, key):
+        if not _KEY_PATTERN.match(key or ''):
+            raise ValueError(f"Invalid SVG key: {key!r}")
+        return os.path.join(self.folder, key[:2], f"{key}.svg")
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    def get(self, key):
+        try:
+            with open(self.path(key), 'r') as f:
+                return f.read()
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def digest(self, key):
+        """Short digest of the stored SVG's bytes, or None if it is not stored"""
+        try:
+            path = self.path(key)
+            stat = os.stat(path)
+        except (FileNotFoundError, ValueError):
+            return None
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        cached = _digests.get(path)
+        if cached is None or cached[0] != signature:
+            with open(path, 'rb') as f:
+                cached = _digests[path] = (signature, hashlib.sha1(f.read()).hexdigest()[:16])
+        return cached[1]
+
+    def generation(self):
+        """Changes whenever a stored SVG is rewritten, so pages embedding SVG URLs can be revalidated"""
+        try:
+            stat = os.stat(os.path.join(self.folder, 'generation'))
+        except FileNotFoundError:
+            return None
+        return [stat.st_ino, stat.st_mtime_ns]
+
+    def compressed_path(self, key, encoding):
+        """Path of the precompressed copy for a Content-Encoding, or None if it is not stored"""
+        suffix = COMPRESSED_ENCODINGS.get(encoding, (None,))[0]
+        path = f"{self.path(key)}{suffix}" if suffix else None
+        return path if path and os.path.exists(path) else None
+
+    def _write_compressed(self, path, svg, missing_only=False):
+        data = svg.encode('utf-8')
+        for suffix, compress in COMPRESSED_ENCODINGS.values():
+            if not (missing_only and os.path.exists(f"{path}{suffix}")):
+                compressed = compress(data)
+                atomic_write(f"{path}{suffix}", lambda f: f.write(compressed), mode='wb')
+
+    def put(self, key, svg, overwrite=False):
+        """Store an SVG; with `overwrite` an existing one is replaced if its bytes differ"""
+        path = self.path(key)
+        exists = os.path.exists(path)
+        if exists and (not overwrite or self.get(key) == svg):
+            if overwrite:
+                self._write_compressed(path, svg, missing_only=True)
+            return key
+        # Compressed copies first: once the SVG exists, so do they
+        self._write_compressed(path, svg)
+        atomic_write(path, lambda f: f.write(svg))
+        if exists:
+            atomic_write(os.path.join(self.folder, 'generation'), lambda f: f.write(self.digest(key)))
+        return key
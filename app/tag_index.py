@@ -0,0 +1,114 @@
+import threading
+
+# Tag filter modes: items carrying any of the selected tags, or all of them
+MATCH_ANY = 'any'
+MATCH_ALL = 'all'
+
+class TagIndex:
+    """Per-tag bitmaps over the items of a store, for tag filters and facet counts.
+
+    Every item id is given a bit position, and each tag keeps an int with the
+    bits of the items carrying it, so any-of and all-of filters are ORs and
+    ANDs of a few ints and a tag's facet count is a popcount. Like
+    SearchIndex, `sync(version, items)` only touches the items whose tags
+    changed since the last store version.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._slots = {}  # item id -> bit position
+        self._ids = []  # bit position -> item id, None once freed
+        self._free = []  # bit positions to reuse
+        self._tags = {}  # item id -> tags as indexed
+        self._bitmaps = {}  # tag id -> bitmap of the items carrying it
+
+    @property
+    def version(self):
+        return self._version
+
+    def sync(self, version, items):
+        with self._lock:
+            if version is not None and version == self._version:
+                return
+            seen = set()
+            for item in items:
+                item_id = item.get('id')
+                seen.add(item_id)
+                tags = tuple(item.get('tags', []))
+                if self._tags.get(item_id) != tags:
+                    self._set_tags(item_id, tags)
+            for item_id in [item_id for item_id in self._tags if item_id not in seen]:
+                self._set_tags(item_id, None)
+            self._version = version
+
+    def _set_tags(self, item_id, tags):
+        """Index an item's tags, or forget the item if tags is None; the caller holds the lock"""
+        slot = self._slots.get(item_id)
+        if slot is None:
+            slot = self._free.pop() if self._free else len(self._ids)
+            if slot == len(self._ids):
+                self._ids.append(None)
+            self._slots[item_id] = slot
+            self._ids[slot] = item_id
+        bit = 1 << slot
+        for tag in set(self._tags.pop(item_id, ())):
+            bitmap = self._bitmaps[tag] & ~bit
+            if bitmap:
+                self._bitmaps[tag] = bitmap
+            else:
+                del self._bitmaps[tag]
+        if tags is None:
+            del self._slots[item_id]
+            self._ids[slot] = None
+            self._free.append(slot)
+            return
+        for tag in tags:
+            self._bitmaps[tag] = self._bitmaps.get(tag, 0) | bit
+        self._tags[item_id] = tags
+
+    def _bitmap(self, item_ids):
+        bits = bytearray(len(self._ids) // 8 + 1)
+        for item_id in item_ids:
+            slot = self._slots.get(item_id)
+            if slot is not None:
+                bits[slot >> 3] |= 1 << (slot & 7)
+        return int.from_bytes(bits, 'little')
+
+    def _item_ids(self, bitmap):
+        ids = set()
+        for index, byte in enumerate(bitmap.to_bytes(len(self._ids) // 8 + 1, 'little')):
+            while byte:
+                low = byte & -byte
+                ids.add(self._ids[index * 8 + low.bit_length() - 1])
+                byte ^= low
+        return ids
+
+    def match(self, tags, mode=MATCH_ANY, candidates=None):
+        """Return the ids carrying any (or all) of the tags, restricted to `candidates` if given"""
+        with self._lock:
+            bitmaps = [self._bitmaps.get(tag, 0) for tag in tags]
+            if not bitmaps:
+                result = self._bitmap(self._slots)
+            elif mode == MATCH_ALL:
+                result = bitmaps[0]
+                for bitmap in bitmaps[1:]:
+                    result &= bitmap
+            else:
+                result = 0
+                for bitmap in bitmaps:
+                    result |= bitmap
+            if candidates is not None:
+                result &= self._bitmap(candidates)
+            return self._item_ids(result)
+
+    def facets(self, item_ids):
+        """Return {tag id: number of the given items carrying it}, for tags carried by any of them"""
+        with self._lock:
+            result = self._bitmap(item_ids)
+            counts = {tag: (bitmap & result).bit_count() for tag, bitmap in self._bitmaps.items()}
+        return {tag: count for tag, count in counts.items() if count}
+
+    def stats(self):
+        with self._lock:
+            return {'items': len(self._slots), 'tags': len(self._bitmaps), 'version': str(self._version)}
@@ -0,0 +1,75 @@
+from contextlib import contextmanager
+from app.repository import clone_item
+
+class UnitOfWork:
+    """The data stores as seen by one request, over a storage backend.
+
+    Each store is loaded at most once and each item fetched at most once;
+    callers still get private copies. Writes (upsert, append, transaction)
+    carry their own concurrency checks and go straight to storage, after
+    which the store is read from storage again.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self._loaded = {}  # store -> (version, items) as loaded from storage
+        self._by_id = {}  # store -> item id -> item, over the loaded items
+        self._items = {}  # store -> item id -> item (or None) fetched without loading the store
+
+    def _current(self, store):
+        """(version, items) of a store, loading it on first use"""
+        if store not in self._loaded:
+            self._loaded[store] = self.storage.load_versioned(store)
+        return self._loaded[store]
+
+    def _forget(self, store):
+        """Drop what is known about a store after writing it, so the next read sees storage again"""
+        for state in (self._loaded, self._by_id, self._items):
+            state.pop(store, None)
+
+    def load(self, store):
+        return clone_item(self._current(store)[1])
+
+    def load_versioned(self, store):
+        version, items = self._current(store)
+        return version, clone_item(items)
+
+    def get(self, store, item_id):
+        if store in self._loaded:
+            if store not in self._by_id:
+                self._by_id[store] = {item.get('id'): item for item in self._loaded[store][1]}
+            item = self._by_id[store].get(item_id)
+        else:
+            items = self._items.setdefault(store, {})
+            if item_id not in items:
+                items[item_id] = self.storage.get(store, item_id)
+            item = items[item_id]
+        return clone_item(item) if item is not None else None
+
+    def find(self, store, field, value):
+        if store in self._loaded:
+            return [item for item in self.load(store) if item.get(field) == value]
+        return self.storage.find(store, field, value)
+
+    def version(self, store):
+        return self.storage.version(store)
+
+    def upsert(self, store, item):
+        try:
+            self.storage.upsert(store, item)
+        finally:
+            self._forget(store)
+
+    def append(self, store, item):
+        try:
+            self.storage.append(store, item)
+        finally:
+            self._forget(store)
+
+    @contextmanager
+    def transaction(self, store):
+        try:
+            with self.storage.transaction(store) as items:
+                yield items
+        finally:
+            self._forget(store)
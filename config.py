@@ -7,10 +7,37 @@ load_dotenv(os.path.join(basedir, '.env'))
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'you-will-never-guess'
     QUESTIONS_FILE = os.path.join(basedir, 'app/data/questions.json')
-    SUBMISSIONS_FILE = os.path.join(basedir, 'app/data/submissions.json')
+    SUBMISSIONS_FILE = os.path.join(basedir, 'app/data/submissions.json')  # Legacy format, migrated into the log once
+    SUBMISSIONS_LOG_FILE = os.path.join(basedir, 'app/data/submissions.jsonl')
+    SUBMISSIONS_FSYNC_BATCH = 32  # fsync the submission log after this many appends...
+    SUBMISSIONS_FSYNC_INTERVAL = 1.0  # ...or after this many seconds, whichever comes first
     QUIZZES_FILE = os.path.join(basedir, 'app/data/quizzes.json')
     TAGS_FILE = os.path.join(basedir, 'app/data/tags.json')
     QUIZ_TAGS_FILE = os.path.join(basedir, 'app/data/quiz_tags.json')
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'json')  # 'json' (files above) or 'sqlite'
+    SQLITE_DATABASE = os.environ.get('SQLITE_DATABASE') or os.path.join(basedir, 'app/data/omega.sqlite3')
+    SVG_STORE_FOLDER = os.path.join(basedir, 'app/data/svg')  # Rendered question SVGs, keyed by LaTeX hash
+    RENDER_CACHE_DATABASE = os.path.join(basedir, 'app/data/render_cache.sqlite3')  # LaTeX renders shared by all workers
+    RENDER_CACHE_MAX_BYTES = 256 * 1024 * 1024  # Least recently used renders are evicted beyond this size
+    LATEX_MEMORY_CACHE_MAX_BYTES = 32 * 1024 * 1024  # Per-process LRU cache in front of the render cache
+    LATEX_MEMORY_CACHE_TTL = 3600  # Seconds an in-memory render is kept
+    PAGE_CACHE_MAX_BYTES = 16 * 1024 * 1024  # Per-process cache of rendered listing and question pages; 0 turns it off
+    PAGE_CACHE_TTL = 600  # Seconds a rendered page is kept; a data change makes it unreachable sooner
+    RENDER_WORKERS = int(os.environ.get('RENDER_WORKERS', 0)) or None  # Background render processes; None uses one per CPU
+    RENDER_INTERACTIVE_RESERVED = 1  # Render processes kept free for editor previews while questions render
+    RENDER_BATCH_SIZE = 16  # Questions compiled together in one multi-page pdflatex run
+    RENDER_RETRY_DELAY = 60  # Seconds before a stopped or crashed render is tried again; doubles with each failure
+    RENDER_RETRY_MAX_DELAY = 3600  # Longest wait between retries of a render that keeps failing
+    # Limits for each pdflatex/pdf2svg run; shell escape lets documents run commands, so it is off by default
+    LATEX_TIMEOUT = 30  # Wall-clock seconds
+    LATEX_CPU_LIMIT = 20  # CPU seconds
+    LATEX_MEMORY_LIMIT = 1024 * 1024 * 1024  # Address space in bytes
+    LATEX_OUTPUT_LIMIT = 64 * 1024 * 1024  # Largest file a run may write, in bytes
+    LATEX_SHELL_ESCAPE = os.environ.get('LATEX_SHELL_ESCAPE', '').lower() in ('1', 'true', 'yes')
+    LATEX_FORMAT_FOLDER = os.path.join(basedir, 'app/data/latex_formats')  # Precompiled preambles, rebuilt when TeX changes
+    QUESTIONS_PER_PAGE = 20  # Questions listed per page; more load as the list is scrolled
+    QUIZZES_PER_PAGE = 50
+    API_QUESTIONS_MAX_PAGE = 100  # Largest page size /api/questions accepts with limit=
     UPLOAD_FOLDER = os.path.join(basedir, 'app/uploads')
     MAX_CONTENT_LENGTH = 100 * 1024 * 1024  # 100 MB max upload size
     ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'webm', 'mp4', 'docx', 'xlsx', 'pptx'}
@@ -0,0 +1,171 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from app import app
+from app.latex import ensure_complete_latex_document, get_latex_cache_key, render_latex_batch, group_render_batches
+from app.routes import (move_inline_svg_to_store, get_svg_store, get_cached_latex_svg, record_render_result,
+                        record_render_failure, get_render_failure, get_render_limits)
+from app.storage import get_storage, copy_stores, SEQUENCED_STORES
+from app.svg_optimize import optimize_svg
+
+def compact_submissions(args):
+    """Rewrite the submission log without torn lines or duplicate records"""
+    log = get_storage(app.config, backend='json').submissions_log
+    before, after = log.compact()
+    print(f"Compacted {log.log_path}: {before} -> {after} records")
+
+def import_json(args):
+    """Copy the app/data JSON files into the SQLite database"""
+    counts = copy_stores(get_storage(app.config, backend='json'), get_storage(app.config, backend='sqlite'))
+    for store, count in counts.items():
+        print(f"Imported {count} {store} into {app.config['SQLITE_DATABASE']}")
+
+def export_json(args):
+    """Write the SQLite database back out to the app/data JSON files"""
+    counts = copy_stores(get_storage(app.config, backend='sqlite'), get_storage(app.config, backend='json'))
+    for store, count in counts.items():
+        print(f"Exported {count} {store} from {app.config['SQLITE_DATABASE']}")
+
+def migrate_svgs(args):
+    """Move inline SVG data URIs out of the questions into the SVG asset store"""
+    with get_storage(app.config).transaction('questions') as questions:
+        moved = sum(1 for question in questions if move_inline_svg_to_store(question))
+    print(f"Moved {moved} of {len(questions)} question SVGs into {app.config['SVG_STORE_FOLDER']}")
+
+def backfill_seq(args):
+    """Number questions and quizzes stored before they got a `seq`, in their stored (insertion) order"""
+    for store in SEQUENCED_STORES:
+        with get_storage(app.config).transaction(store) as items:
+            missing = sum(1 for item in items if item.get('seq') is None)
+            if missing:
+                # Items without a seq are older than every numbered one, so renumber the whole store in order
+                for index, item in enumerate(items):
+                    item['seq'] = index + 1
+        print(f"Numbered {len(items) if missing else 0} {store} ({missing} had no seq)")
+
+def optimize_svgs(args):
+    """Minify the SVGs already in the asset store and write their precompressed copies.
+
+    Rewritten SVGs get a new digest, and with it new URLs and ETags, so
+    clients holding the old bytes as immutable fetch the minified ones.
+    """
+    svg_store = get_svg_store()
+    count = before = after = 0
+    for _, _, files in os.walk(svg_store.folder):
+        for filename in files:
+            if not filename.endswith('.svg'):
+                continue
+            svg = svg_store.get(filename[:-len('.svg')])
+            if svg is None:
+                continue
+            optimized = optimize_svg(svg)
+            svg_store.put(filename[:-len('.svg')], optimized, overwrite=True)
+            count += 1
+            before += len(svg.encode('utf-8'))
+            after += len(optimized.encode('utf-8'))
+    print(f"Optimized {count} SVGs in {svg_store.folder}: {before} -> {after} bytes")
+
+def prerender(args):
+    """Render every question's SVG ahead of traffic, in parallel across all cores"""
+    svg_store = get_svg_store()
+    questions = [q for q in get_storage(app.config).load('questions') if args.include_deleted or not q.get('deleted', False)]
+    
+    # Skip documents already in the asset store or the render cache
+    documents = {}
+    for question in questions:
+        complete_latex = ensure_complete_latex_document(question['content'])
+        cache_key = get_latex_cache_key(complete_latex)
+        if cache_key in documents or (not args.force and svg_store.exists(cache_key)):
+            continue
+        # Documents known not to compile (or waiting to retry) are only rendered again with --force
+        if not args.force and get_render_failure(cache_key):
+            continue
+        svg_data = None if args.force else get_cached_latex_svg(cache_key)
+        if svg_data is not None:
+            svg_store.put(cache_key, svg_data)
+        else:
+            documents[cache_key] = complete_latex
+    print(f"{len(questions)} questions, {len(documents)} SVGs to render")
+    
+    keys = list(documents)
+    # Render processes inherit the niceness, so a deploy-time run yields the CPU to a live server's previews
+    if args.nice and hasattr(os, 'nice'):
+        os.nice(args.nice)
+    workers = args.workers or app.config['RENDER_WORKERS'] or os.cpu_count() or 1
+    batch_size = max(1, min(args.batch_size or app.config['RENDER_BATCH_SIZE'], -(-len(keys) // workers))) if keys else 1
+    done = failed = 0
+    start = time.time()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(render_latex_batch, [documents[key] for key in batch],
+                            app.config['LATEX_FORMAT_FOLDER'], get_render_limits()): batch
+            for batch in group_render_batches(keys, documents, batch_size)
+        }
+        for future in as_completed(futures):
+            for cache_key, result in zip(futures[future], future.result()):
+                record_render_result(cache_key, result)
+                # Failed renders are left out of the store and recorded, so questions show the error
+                if result.ok:
+                    svg_store.put(cache_key, result.svg, overwrite=args.force)
+                else:
+                    record_render_failure(cache_key, result)
+                done += 1
+                failed += not result.ok
+            elapsed = time.time() - start
+            print(f"\r  {done}/{len(keys)} rendered, {failed} failed, {done / elapsed if elapsed else 0:.1f} SVGs/s",
+                  end='', file=sys.stderr, flush=True)
+    if keys:
+        print(file=sys.stderr)
+    
+    # Point every question at its stored SVG in a single save
+    with get_storage(app.config).transaction('questions') as stored:
+        updated = 0
+        for question in stored:
+            move_inline_svg_to_store(question)
+            cache_key = get_latex_cache_key(ensure_complete_latex_document(question['content']))
+            # edit_question may have left the right hash on a question not marked as rendered
+            stale = question.get('svg_hash') != cache_key or not question.get('svg_generated')
+            if stale and svg_store.exists(cache_key):
+                question['svg_hash'] = cache_key
+                question['svg_generated'] = True
+                updated += 1
+    print(f"Rendered {done} SVGs ({failed} failed) in {time.time() - start:.1f}s with {workers} workers; updated {updated} questions")
+
+COMMANDS = {
+    'compact-submissions': compact_submissions,
+    'import-json': import_json,
+    'export-json': export_json,
+    'migrate-svgs': migrate_svgs,
+    'backfill-seq': backfill_seq,
+    'optimize-svgs': optimize_svgs,
+    'prerender': prerender,
+}
+
+# Extra options per command: (flags, add_argument keyword arguments)
+ARGUMENTS = {
+    'prerender': [
+        (('--workers',), {'type': int, 'help': 'render processes (default: RENDER_WORKERS, or one per CPU)'}),
+        (('--batch-size',), {'type': int, 'help': 'questions compiled per pdflatex run (default: RENDER_BATCH_SIZE)'}),
+        (('--force',), {'action': 'store_true', 'help': 're-render SVGs that are already stored, e.g. after a TeX upgrade'}),
+        (('--nice',), {'type': int, 'default': 10, 'help': 'lower the CPU priority of the renders by this much (default: 10)'}),
+        (('--include-deleted',), {'action': 'store_true', 'help': 'also render deleted questions'}),
+    ],
+}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintenance commands for the Omega questionbank data")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for name, func in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=func.__doc__)
+        for flags, options in ARGUMENTS.get(name, []):
+            subparser.add_argument(*flags, **options)
+        subparser.set_defaults(func=func)
+
+    args = parser.parse_args(argv)
+    with app.app_context():
+        return args.func(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,25 @@
+import json
+import os
+import sys
+
+import pytest
+
+# Let `pytest` run from any directory import the app package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def app_data(tmp_path, monkeypatch):
+    """Point the app's data files at tmp_path; returns a function writing {config key: items} to them"""
+    from app import app
+    for key in ('QUESTIONS_FILE', 'SUBMISSIONS_FILE', 'SUBMISSIONS_LOG_FILE', 'QUIZZES_FILE', 'TAGS_FILE',
+                'QUIZ_TAGS_FILE', 'SVG_STORE_FOLDER', 'RENDER_CACHE_DATABASE'):
+        monkeypatch.setitem(app.config, key, str(tmp_path / os.path.basename(app.config[key])))
+    monkeypatch.setitem(app.config, 'STORAGE_BACKEND', 'json')
+
+    def write(**stores):
+        stores = {'QUESTIONS_FILE': [], 'TAGS_FILE': [], 'QUIZZES_FILE': [], 'QUIZ_TAGS_FILE': [], **stores}
+        for key, items in stores.items():
+            with open(app.config[key], 'w') as f:
+                json.dump(items, f)
+    return write
@@ -0,0 +1,60 @@
+from app import app, routes
+from app.latex import ensure_complete_latex_document, get_latex_cache_key
+from app.storage import get_storage
+
+def make_questions(count):
+    """Questions whose SVGs are already stored, so their pages can be cached"""
+    questions = []
+    for i in range(count):
+        content = f'$x^{i}$'
+        svg_hash = routes.get_svg_store().put(get_latex_cache_key(ensure_complete_latex_document(content)), '<svg/>')
+        questions.append({'id': str(i), 'name': f'Question {i}', 'content': content, 'answer': str(i), 'rating': 1.0,
+                          'tags': [], 'deleted': False, 'attachments': [], 'seq': i + 1,
+                          'svg_hash': svg_hash, 'svg_generated': True})
+    return questions
+
+def test_revalidation_gets_304_until_the_data_changes(app_data):
+    app_data(QUESTIONS_FILE=make_questions(3))
+    client = app.test_client()
+
+    first = client.get('/questionbank')
+    etag = first.headers['ETag']
+    assert first.status_code == 200 and first.headers['Cache-Control'] == 'no-cache'
+    revalidated = client.get('/questionbank', headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304 and revalidated.headers['ETag'] == etag
+
+    # Another URL is another page
+    assert client.get('/questionbank?sort=rating_asc').headers['ETag'] != etag
+
+    question = get_storage(app.config).get('questions', '1')
+    get_storage(app.config).upsert('questions', dict(question, name='Renamed'))
+    changed = client.get('/questionbank', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert 'Renamed' in changed.get_data(as_text=True)
+
+def test_unchanged_page_is_served_from_the_page_cache(app_data, monkeypatch):
+    app_data(QUESTIONS_FILE=make_questions(2))
+    client = app.test_client()
+    first = client.get('/questionbank')
+
+    def fail(*args, **kwargs):
+        raise AssertionError('a cached page must not be rendered again')
+    monkeypatch.setattr(routes, 'find_question_ids', fail)
+
+    second = client.get('/questionbank')
+    assert second.status_code == 200
+    assert second.get_data() == first.get_data()
+    assert second.headers['ETag'] == first.headers['ETag']
+
+def test_pages_with_flash_messages_are_not_validated(app_data):
+    app_data(QUESTIONS_FILE=make_questions(1))
+    client = app.test_client()
+    etag = client.get('/questionbank').headers['ETag']
+
+    with client.session_transaction() as session:
+        session['_flashes'] = [('success', 'Question saved')]
+    response = client.get('/questionbank', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert 'ETag' not in response.headers
+    assert 'Question saved' in response.get_data(as_text=True)
@@ -0,0 +1,56 @@
+import shutil
+
+import pytest
+
+from app import latex
+from app.latex import ensure_complete_latex_document, group_render_batches, render_latex_batch, RenderResult
+
+PLAIN_MATH = [ensure_complete_latex_document(f"$x^{i} + {i}$") for i in range(3)]
+QUESTIONS = [ensure_complete_latex_document(f"\\begin{{questions}}\n\\question What is ${i} + {i}$?\n\\end{{questions}}")
+             for i in range(3)]
+
+tex_installed = shutil.which("pdflatex") and shutil.which("pdf2svg")
+
+
+def test_plain_math_documents_share_a_batch_with_a_preview_page_each(monkeypatch):
+    rendered = []
+    def render_pages(preamble, bodies, *args):
+        rendered.append((preamble, bodies))
+        return [f"page {i}" for i in range(len(bodies))]
+    monkeypatch.setattr(latex, "_render_pages", render_pages)
+
+    assert [result.svg for result in render_latex_batch(PLAIN_MATH)] == ["page 0", "page 1", "page 2"]
+    assert len(rendered) == 1
+
+
+def test_page_breaks_keep_a_plain_math_document_alone():
+    documents = dict(enumerate(PLAIN_MATH + QUESTIONS))
+    documents[6] = ensure_complete_latex_document("$x$ \\newpage $y$")
+
+    batches = group_render_batches(list(documents), documents, 16)
+
+    assert batches == [[0, 1, 2, 3, 4, 5], [6]]
+
+
+def test_whole_document_batch_wraps_each_body_in_a_preview(monkeypatch):
+    compiled = []
+    def compile_pdf(temp_dir, document, **kwargs):
+        compiled.append(document)
+        return None, "stop"
+    monkeypatch.setattr(latex, "_compile_pdf", compile_pdf)
+    preamble, body = latex.split_latex_document(PLAIN_MATH[0])
+
+    latex._render_pages(preamble, [body, body], None, None)
+
+    assert "\\PreviewEnvironment" not in compiled[0]
+    assert compiled[0].count("\\begin{preview}") == 2
+    assert compiled[0].split("\\begin{document}")[0] in latex.GENERATED_PREAMBLES
+
+
+@pytest.mark.skipif(not tex_installed, reason="pdflatex and pdf2svg are not installed")
+def test_batch_renders_every_document():
+    results = render_latex_batch(QUESTIONS + PLAIN_MATH)
+
+    assert len(results) == len(QUESTIONS + PLAIN_MATH)
+    assert all(result.ok for result in results), [result.error for result in results]
+    assert all("<svg" in result.svg for result in results)
@@ -0,0 +1,46 @@
+import os
+import subprocess
+
+import pytest
+
+from app import latex
+from app.sandbox import SandboxKilled
+
+PREAMBLE = latex.build_latex_preamble()
+
+
+@pytest.fixture
+def format_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(latex, "tex_tree_signature", lambda: "tree")
+    return str(tmp_path)
+
+
+def failed_markers(format_folder):
+    return [name for name in os.listdir(os.path.join(format_folder, "tree")) if name.endswith(".failed")]
+
+
+def test_stopped_format_build_is_retried(format_folder, monkeypatch):
+    def killed(*args, **kwargs):
+        raise SandboxKilled("time limit of 1s exceeded")
+    monkeypatch.setattr(latex, "run_sandboxed", killed)
+
+    assert latex.get_latex_format(format_folder, PREAMBLE) is None
+    assert failed_markers(format_folder) == []
+
+
+def test_preamble_that_does_not_compile_is_marked_failed(format_folder, monkeypatch):
+    monkeypatch.setattr(latex, "run_sandboxed", lambda command, *args: subprocess.CompletedProcess(command, 1, "", ""))
+
+    assert latex.get_latex_format(format_folder, PREAMBLE) is None
+    assert len(failed_markers(format_folder)) == 1
+
+
+@pytest.mark.parametrize("returncode, permanent", [(1, True), (-9, False)])
+def test_only_compile_errors_are_permanent_render_failures(format_folder, monkeypatch, returncode, permanent):
+    monkeypatch.setattr(latex, "run_sandboxed",
+                        lambda command, *args: subprocess.CompletedProcess(command, returncode, "", ""))
+
+    result = latex.render_latex(latex.ensure_complete_latex_document("$x$"), format_folder)
+
+    assert not result.ok and not result.killed
+    assert result.permanent is permanent
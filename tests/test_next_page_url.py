@@ -0,0 +1,16 @@
+from urllib.parse import urlsplit, parse_qs
+from app import app
+from app.routes import next_page_url
+
+def test_query_keys_matching_view_args_or_url_for_options_are_kept():
+    url = '/quizzes/q1/edit?quiz_id=x&_external=1&_anchor=top&tags=a&tags=b&cursor=old'
+    with app.test_request_context(url):
+        next_url = next_page_url('next')
+    parts = urlsplit(next_url)
+    assert (parts.scheme, parts.path, parts.fragment) == ('', '/quizzes/q1/edit', '')
+    assert parse_qs(parts.query) == {'quiz_id': ['x'], '_external': ['1'], '_anchor': ['top'],
+                                     'tags': ['a', 'b'], 'cursor': ['next']}
+
+def test_last_page_has_no_next_url():
+    with app.test_request_context('/questionbank'):
+        assert next_page_url(None) is None
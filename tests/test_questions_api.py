@@ -0,0 +1,48 @@
+from app import app
+from app.storage import get_storage
+
+def make_question(i, **fields):
+    return {'id': f'q{i}', 'name': f'Question {i}', 'content': f'$x^{i}$', 'answer': str(i), 'rating': float(i % 3),
+            'tags': ['algebra'] if i % 2 else ['calculus'], 'deleted': False, 'attachments': [], 'seq': i, **fields}
+
+def follow(client, url):
+    """Every page of an /api/questions listing, following `next` links"""
+    pages = []
+    while url:
+        body = client.get(url).get_json()
+        assert body['success']
+        pages.append([question['id'] for question in body['questions']])
+        url = body['next']
+    return pages
+
+def test_cursor_pages_cover_the_listing_once(app_data):
+    app_data(QUESTIONS_FILE=[make_question(i) for i in range(1, 8)] + [make_question(8, deleted=True)])
+    client = app.test_client()
+
+    assert follow(client, '/api/questions?limit=3') == [['q7', 'q6', 'q5'], ['q4', 'q3', 'q2'], ['q1']]
+    # Ratings tie between questions, and the id keeps their order stable across pages
+    assert follow(client, '/api/questions?limit=2&sort=rating_asc') == [['q3', 'q6'], ['q1', 'q4'], ['q7', 'q2'], ['q5']]
+    # Filters are carried into the next links
+    assert follow(client, '/api/questions?limit=2&tags=algebra') == [['q7', 'q5'], ['q3', 'q1']]
+
+    body = client.get('/api/questions?limit=2&show_deleted=true&fields=id,deleted').get_json()
+    assert body['questions'] == [{'id': 'q8', 'deleted': True}, {'id': 'q7', 'deleted': False}]
+    assert body['total'] == 8
+
+def test_new_questions_do_not_shift_later_pages(app_data):
+    app_data(QUESTIONS_FILE=[make_question(i) for i in range(1, 6)])
+    client = app.test_client()
+    first = client.get('/api/questions?limit=2').get_json()
+
+    get_storage(app.config).append('questions', make_question(9))
+
+    assert [question['id'] for question in first['questions']] == ['q5', 'q4']
+    assert follow(client, first['next']) == [['q3', 'q2'], ['q1']]
+
+def test_bad_limits_and_fields_are_rejected(app_data):
+    app_data(QUESTIONS_FILE=[make_question(1)])
+    client = app.test_client()
+
+    assert client.get('/api/questions?limit=many').status_code == 400
+    assert client.get('/api/questions?fields=id,password').status_code == 400
+    assert len(client.get('/api/questions?limit=0').get_json()['questions']) == 1
@@ -0,0 +1,48 @@
+import time
+from app.render_cache import RenderCache
+
+def test_lookups_take_no_write_lock(tmp_path):
+    cache = RenderCache(str(tmp_path / 'render_cache.sqlite3'), max_bytes=1 << 20)
+    cache.put('a' * 32, '<svg/>')
+    statements = []
+    cache.connection().set_trace_callback(statements.append)
+    for _ in range(10):
+        assert cache.get('a' * 32) == '<svg/>'
+        assert cache.get('b' * 32) is None
+    assert not [sql for sql in statements if not sql.lstrip().upper().startswith('SELECT')]
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (10, 10)
+
+def test_hits_refresh_recency_before_eviction(tmp_path):
+    cache = RenderCache(str(tmp_path / 'render_cache.sqlite3'), max_bytes=40)
+    cache.put('a' * 32, '<svg>first</svg>')
+    cache.put('b' * 32, '<svg/>')
+    # Pretend the first entry was last used long ago, then hit it: the next put must evict the other one
+    with cache.connection() as conn:
+        conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time() - 3600, 'a' * 32))
+    assert cache.get('a' * 32) == '<svg>first</svg>'
+    cache.put('c' * 32, '<svg>third one</svg>')
+    assert cache.get('a' * 32) == '<svg>first</svg>'
+    assert cache.get('b' * 32) is None
+    assert cache.stats()['evictions'] == 1
+
+def test_failures_back_off_until_a_render_succeeds(tmp_path):
+    cache = RenderCache(str(tmp_path / 'render_cache.sqlite3'), max_bytes=1 << 20)
+    key = 'a' * 32
+    cache.put_failure(key, '<svg>stopped</svg>', 'time limit exceeded', False, retry_delay=10, max_retry_delay=25)
+    first = cache.get_failure(key)
+    assert not first.permanent and 9 < first.retry_at - time.time() <= 10
+    cache.put_failure(key, '<svg>stopped</svg>', 'time limit exceeded', False, retry_delay=10, max_retry_delay=25)
+    assert 19 < cache.get_failure(key).retry_at - time.time() <= 20
+    cache.put_failure(key, '<svg>stopped</svg>', 'time limit exceeded', False, retry_delay=10, max_retry_delay=25)
+    assert 24 < cache.get_failure(key).retry_at - time.time() <= 25
+    
+    cache.put(key, '<svg/>')
+    assert cache.get_failure(key) is None
+
+def test_compile_errors_are_never_retried(tmp_path):
+    cache = RenderCache(str(tmp_path / 'render_cache.sqlite3'), max_bytes=1 << 20)
+    cache.put_failure('b' * 32, '<svg>error</svg>', 'LaTeX compilation failed', True, retry_delay=10, max_retry_delay=25)
+    failure = cache.get_failure('b' * 32)
+    assert failure.permanent and failure.retry_at is None and failure.svg == '<svg>error</svg>'
+    assert cache.stats()['failed_documents'] == 1
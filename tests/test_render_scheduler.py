@@ -0,0 +1,18 @@
+import os
+from concurrent.futures.process import BrokenProcessPool
+import pytest
+from app.render_queue import RenderScheduler, INTERACTIVE, BATCH
+
+def crash_worker():
+    os._exit(1)
+
+def test_scheduler_recovers_from_a_dead_worker():
+    scheduler = RenderScheduler(max_workers=1)
+    try:
+        with pytest.raises(BrokenProcessPool):
+            scheduler.submit(BATCH, crash_worker).result(timeout=30)
+        # Later jobs get a fresh pool instead of failing until the process restarts
+        assert scheduler.submit(INTERACTIVE, pow, 2, 10).result(timeout=30) == 1024
+        assert scheduler.stats()[BATCH]['running'] == 0
+    finally:
+        scheduler.shutdown()
@@ -0,0 +1,57 @@
+from app.search_index import SearchIndex, tokenize
+
+QUESTIONS = [
+    {'id': '1', 'name': 'Chain rule', 'content': r'Differentiate $\sin(x^2)$'},
+    {'id': '2', 'name': 'Fractions', 'content': r'Simplify $\frac{1}{2} + \frac{1}{3}$'},
+    {'id': '3', 'name': 'Limits', 'content': r'Evaluate $\lim_{x \to 0} \frac{\sin x}{x}$'},
+]
+
+def make_index(items=QUESTIONS, version=1):
+    index = SearchIndex()
+    index.sync(version, items)
+    return index
+
+def test_latex_commands_are_searchable_with_or_without_backslash():
+    assert '\\frac' in tokenize(r'$\frac{1}{2}$') and 'frac' in tokenize(r'$\frac{1}{2}$')
+    index = make_index()
+    assert sorted(index.search(r'\frac')) == ['2', '3']
+    assert sorted(index.search('frac')) == ['2', '3']
+
+def test_results_match_every_term_and_rank_by_bm25():
+    index = make_index()
+
+    # Question 2 uses \frac twice in a shorter document
+    assert index.search('frac') == ['2', '3']
+    assert index.search('frac sin') == ['3']
+    assert index.search('frac integral') == []
+
+    # Name terms count more than content terms
+    index = make_index([{'id': 'a', 'name': 'Other', 'content': 'limits'},
+                        {'id': 'b', 'name': 'Limits', 'content': 'other'}])
+    (best, best_score), (_, score) = index.search('limits', with_scores=True)
+    assert best == 'b' and best_score > score
+    assert index.search('limits', limit=1) == ['b']
+
+def test_last_term_matches_as_a_prefix():
+    index = make_index()
+    assert index.search('differ') == ['1']
+    assert index.search('sin differ') == ['1']
+    assert index.search('differ sin') == []
+    assert index.search('d') == []
+
+def test_candidates_restrict_results():
+    assert make_index().search('frac', candidates={'3'}) == ['3']
+
+def test_sync_reindexes_only_changes_and_drops_removed_items():
+    index = make_index()
+    edited = [dict(QUESTIONS[0], content='Integrate $x$'), QUESTIONS[1]]
+
+    # The same version is taken as unchanged
+    index.sync(1, edited)
+    assert index.search('integrate') == []
+
+    index.sync(2, edited)
+    assert index.search('integrate') == ['1']
+    assert index.search('differentiate') == []
+    assert index.search('limits') == []
+    assert index.stats()['documents'] == 2
@@ -0,0 +1,42 @@
+from app.sort_index import SortIndex
+
+ORDERS = {'rating': lambda item: (item['rating'], item['id'])}
+ITEMS = [{'id': str(i), 'rating': rating} for i, rating in enumerate([3, 1, 2, 1, 5])]
+
+def make_index(items=ITEMS, version=1):
+    index = SortIndex(ORDERS)
+    index.sync(version, items)
+    return index
+
+def pages(index, reverse=False, candidates=None, size=2):
+    """Every page of the rating order, following next keys"""
+    result, after = [], None
+    while True:
+        ids, after = index.page('rating', after, reverse, candidates, size)
+        result.append(ids)
+        if after is None:
+            return result
+
+def test_pages_follow_keys_in_either_direction():
+    index = make_index()
+    assert pages(index) == [['1', '3'], ['2', '0'], ['4']]
+    assert pages(index, reverse=True) == [['4', '0'], ['2', '3'], ['1']]
+    assert pages(index, candidates={'0', '3', '4'}) == [['3', '0'], ['4']]
+
+def test_cursor_keeps_its_place_when_items_change():
+    index = make_index()
+    first, after = index.page('rating', size=2)
+
+    # Items added before the cursor don't repeat the first page, and later ones are still reached
+    index.sync(2, ITEMS + [{'id': '5', 'rating': 0}, {'id': '6', 'rating': 4}])
+    rest, _ = index.page('rating', after, size=10)
+    assert first == ['1', '3']
+    assert rest == ['2', '0', '6', '4']
+
+def test_sync_moves_changed_items():
+    index = make_index()
+    index.sync(2, [dict(item, rating=10) if item['id'] == '1' else item for item in ITEMS[:4]])
+    assert index.page('rating', size=10) == (['3', '2', '0', '1'], None)
+
+def test_foreign_cursor_starts_from_the_beginning():
+    assert make_index().page('rating', ['not', 'a', 'key', 1], size=1) == (['1'], [1, '1'])
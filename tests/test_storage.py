@@ -0,0 +1,76 @@
+import pytest
+from app.storage import JsonStorage, SqliteStorage, STORE_FILES, StaleDataError, copy_stores
+
+def make_config(folder):
+    config = {key: str(folder / f"{store}.json") for store, key in STORE_FILES.items()}
+    config['SQLITE_DATABASE'] = str(folder / 'omega.sqlite3')
+    return config
+
+@pytest.fixture(params=[JsonStorage, SqliteStorage], ids=['json', 'sqlite'])
+def storage(request, tmp_path):
+    return request.param(make_config(tmp_path))
+
+def test_find_matches_indexed_and_other_fields(storage):
+    for i, (question_id, quiz_id) in enumerate([('q1', 'quiz1'), ('q2', None), ('q1', None)]):
+        storage.append('submissions', {'id': f's{i}', 'question_id': question_id, 'quiz_id': quiz_id, 'outcome': 'Correct' if i else 'Wrong'})
+    assert [s['id'] for s in storage.find('submissions', 'question_id', 'q1')] == ['s0', 's2']
+    assert [s['id'] for s in storage.find('submissions', 'quiz_id', 'quiz1')] == ['s0']
+    assert [s['id'] for s in storage.find('submissions', 'outcome', 'Correct')] == ['s1', 's2']
+
+def test_stores_copy_between_backends(tmp_path):
+    json_storage = JsonStorage(make_config(tmp_path / 'json'))
+    json_storage.append('questions', {'id': 'q1', 'content': '$x$', 'tags': ['algebra'], 'rating': 3.5})
+    json_storage.append('tags', {'id': 'algebra', 'display_name': 'Algebra'})
+    json_storage.append('submissions', {'id': 's1', 'question_id': 'q1', 'outcome': 'Correct'})
+    
+    sqlite_storage = SqliteStorage(make_config(tmp_path / 'sqlite'))
+    counts = copy_stores(json_storage, sqlite_storage)
+    assert counts == {'questions': 1, 'quizzes': 0, 'tags': 1, 'quiz_tags': 0, 'submissions': 1}
+    exported = JsonStorage(make_config(tmp_path / 'exported'))
+    copy_stores(sqlite_storage, exported)
+    for store in STORE_FILES:
+        assert exported.load(store) == sqlite_storage.load(store) == json_storage.load(store)
+    assert sqlite_storage.get('questions', 'q1')['rating'] == 3.5
+
+def test_stale_upsert_is_rejected(storage):
+    storage.upsert('questions', {'id': 'q1', 'name': 'First'})
+    mine, theirs = storage.get('questions', 'q1'), storage.get('questions', 'q1')
+    theirs['name'] = 'Theirs'
+    storage.upsert('questions', theirs)
+    mine['name'] = 'Mine'
+    with pytest.raises(StaleDataError):
+        storage.upsert('questions', mine)
+    assert storage.get('questions', 'q1')['name'] == 'Theirs'
+
+def test_transaction_changes_reject_stale_copies(storage):
+    storage.upsert('tags', {'id': 'algebra', 'display_name': 'Algebra'})
+    storage.upsert('tags', {'id': 'calculus', 'display_name': 'Calculus'})
+    stale = storage.get('tags', 'algebra')
+    unchanged = storage.get('tags', 'calculus')
+    with storage.transaction('tags') as tags:
+        tags[0]['display_name'] = 'Renamed'
+        tags.append({'id': 'geometry', 'display_name': 'Geometry'})
+    assert storage.get('tags', 'geometry')['version'] == 1
+    # Items the transaction changed get a new version; the others keep theirs
+    assert storage.get('tags', 'calculus') == unchanged
+    with pytest.raises(StaleDataError):
+        storage.upsert('tags', stale)
+
+def test_stale_upsert_cannot_undo_a_transaction(storage):
+    # A tag removed from every question (as the tag DELETE does) must not come back through an older copy
+    storage.upsert('questions', {'id': 'q1', 'tags': ['algebra', 'calculus'], 'hints': []})
+    stale = storage.get('questions', 'q1')
+    with storage.transaction('questions') as questions:
+        for question in questions:
+            question['tags'] = [tag for tag in question['tags'] if tag != 'algebra']
+    stale['hints'].append({'id': 'h1', 'text': 'Differentiate'})
+    with pytest.raises(StaleDataError):
+        storage.upsert('questions', stale)
+    assert storage.get('questions', 'q1')['tags'] == ['calculus']
+
+def test_transaction_without_changes_writes_nothing(storage):
+    storage.upsert('tags', {'id': 'algebra', 'display_name': 'Algebra'})
+    version = storage.version('tags')
+    with storage.transaction('tags') as tags:
+        tags.sort(key=lambda tag: tag['id'])
+    assert storage.version('tags') == version
@@ -0,0 +1,57 @@
+import json
+import os
+from app import submission_log
+from app.submission_log import SubmissionLog
+
+def count_fsyncs(monkeypatch):
+    synced = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(submission_log.os, 'fsync', lambda fd: (synced.append(fd), real_fsync(fd))[1])
+    return synced
+
+def test_appends_are_fsynced_in_batches(tmp_path, monkeypatch):
+    synced = count_fsyncs(monkeypatch)
+    log = SubmissionLog(str(tmp_path / 'submissions.jsonl'), fsync_batch=3, fsync_interval=60)
+    for i in range(7):
+        log.append({'id': f's{i}'})
+    assert len(synced) == 2
+    # The remainder waits for the timer, or an explicit sync
+    log.sync()
+    assert len(synced) == 3
+    log.sync()
+    assert len(synced) == 3
+    assert [record['id'] for record in log.iter_records()] == [f's{i}' for i in range(7)]
+
+def test_interval_syncs_a_partial_batch(tmp_path, monkeypatch):
+    synced = count_fsyncs(monkeypatch)
+    log = SubmissionLog(str(tmp_path / 'submissions.jsonl'), fsync_batch=100, fsync_interval=0.05)
+    log.append({'id': 's0'})
+    log._sync_timer.join(5)
+    assert len(synced) == 1
+
+def test_replay_skips_torn_lines_and_compacts_duplicates(tmp_path):
+    path = tmp_path / 'submissions.jsonl'
+    log = SubmissionLog(str(path))
+    log.append({'id': 's1', 'outcome': 'Wrong'})
+    log.append({'id': 's2', 'outcome': 'Correct'})
+    log.append({'id': 's1', 'outcome': 'Correct'})
+    log.sync()
+    with open(path, 'a') as f:
+        f.write('{"id": "s3", "outc')  # interrupted write
+    
+    # A fresh log over the same file replays what was written
+    replayed = SubmissionLog(str(path))
+    assert [record['id'] for record in replayed.iter_records()] == ['s1', 's2', 's1']
+    assert replayed.compact() == (3, 2)
+    assert list(replayed.iter_records()) == [{'id': 's1', 'outcome': 'Correct'}, {'id': 's2', 'outcome': 'Correct'}]
+    replayed.append({'id': 's4'})
+    assert [record['id'] for record in log.iter_records()] == ['s1', 's2', 's4']
+
+def test_legacy_array_is_migrated_once(tmp_path):
+    legacy = tmp_path / 'submissions.json'
+    legacy.write_text(json.dumps([{'id': 's0'}, {'id': 's1'}]))
+    log = SubmissionLog(str(tmp_path / 'submissions.jsonl'), legacy_path=str(legacy))
+    log.append({'id': 's2'})
+    log.sync()
+    SubmissionLog(str(tmp_path / 'submissions.jsonl'), legacy_path=str(legacy))
+    assert [record['id'] for record in log.iter_records()] == ['s0', 's1', 's2']
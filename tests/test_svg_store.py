@@ -0,0 +1,29 @@
+import os
+from app.svg_store import SvgStore, COMPRESSED_ENCODINGS
+
+KEY = 'ab' * 16
+
+def test_rewritten_svg_gets_a_new_digest_and_generation(tmp_path):
+    store = SvgStore(str(tmp_path))
+    store.put(KEY, '<svg>  <g/>  </svg>')
+    digest, generation = store.digest(KEY), store.generation()
+    
+    # A plain put never replaces an existing SVG, and an identical overwrite changes nothing
+    store.put(KEY, '<svg><g/></svg>')
+    store.put(KEY, '<svg>  <g/>  </svg>', overwrite=True)
+    assert (store.digest(KEY), store.generation()) == (digest, generation)
+    
+    # Rewriting the bytes (as optimize-svgs does) changes the digest that URLs and ETags are built from
+    store.put(KEY, '<svg><g/></svg>', overwrite=True)
+    assert store.get(KEY) == '<svg><g/></svg>'
+    assert store.digest(KEY) != digest
+    assert store.generation() != generation
+    assert all(store.compressed_path(KEY, encoding) for encoding in COMPRESSED_ENCODINGS)
+
+def test_overwrite_restores_missing_compressed_copies(tmp_path):
+    store = SvgStore(str(tmp_path))
+    store.put(KEY, '<svg/>')
+    os.remove(store.compressed_path(KEY, 'gzip'))
+    store.put(KEY, '<svg/>', overwrite=True)
+    assert store.compressed_path(KEY, 'gzip')
+    assert store.generation() is None
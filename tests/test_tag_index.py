@@ -0,0 +1,44 @@
+from app.tag_index import TagIndex, MATCH_ALL, MATCH_ANY
+
+QUESTIONS = [
+    {'id': '1', 'tags': ['algebra']},
+    {'id': '2', 'tags': ['algebra', 'calculus']},
+    {'id': '3', 'tags': ['calculus']},
+    {'id': '4', 'tags': []},
+]
+
+def make_index(items=QUESTIONS, version=1):
+    index = TagIndex()
+    index.sync(version, items)
+    return index
+
+def test_match_any_or_all_tags():
+    index = make_index()
+    assert index.match(['algebra', 'calculus'], MATCH_ANY) == {'1', '2', '3'}
+    assert index.match(['algebra', 'calculus'], MATCH_ALL) == {'2'}
+    assert index.match(['geometry']) == set()
+
+    # No tags selected matches everything
+    assert index.match([]) == {'1', '2', '3', '4'}
+
+def test_candidates_restrict_matches():
+    assert make_index().match(['calculus'], candidates={'1', '3'}) == {'3'}
+
+def test_facets_count_tags_among_the_given_items():
+    index = make_index()
+    assert index.facets({'1', '2', '3', '4'}) == {'algebra': 2, 'calculus': 2}
+    assert index.facets({'1'}) == {'algebra': 1}
+    assert index.facets(set()) == {}
+
+def test_sync_moves_changed_tags_and_reuses_freed_slots():
+    index = make_index()
+
+    index.sync(2, [{'id': '1', 'tags': ['calculus']}, QUESTIONS[2]])
+    assert index.match(['algebra']) == set()
+    assert index.match(['calculus']) == {'1', '3'}
+    assert index.stats()['items'] == 2
+
+    # A new item takes a freed bit position without inheriting its tags
+    index.sync(3, [{'id': '1', 'tags': ['calculus']}, QUESTIONS[2], {'id': '5', 'tags': ['geometry']}])
+    assert index.match(['geometry']) == {'5'}
+    assert index.facets({'5'}) == {'geometry': 1}
@@ -0,0 +1,44 @@
+import builtins
+import itertools
+import json
+import os
+from app import app, repository
+from app.latex import ensure_complete_latex_document, get_latex_cache_key
+from app.routes import get_svg_store
+
+TAG_COUNT = 12
+
+def test_questionbank_reads_tags_once(tmp_path, monkeypatch):
+    for key in ('QUESTIONS_FILE', 'SUBMISSIONS_FILE', 'SUBMISSIONS_LOG_FILE', 'QUIZZES_FILE', 'TAGS_FILE',
+                'QUIZ_TAGS_FILE', 'SVG_STORE_FOLDER', 'RENDER_CACHE_DATABASE'):
+        monkeypatch.setitem(app.config, key, str(tmp_path / os.path.basename(app.config[key])))
+    monkeypatch.setitem(app.config, 'STORAGE_BACKEND', 'json')
+    
+    # Every question carries every tag and already has its SVG, so the page renders TAG_COUNT badges per question
+    tags = [{'id': f'tag{i}', 'display_name': f'Tag {i}'} for i in range(TAG_COUNT)]
+    questions = []
+    for i in range(5):
+        content = f'$x^{i}$'
+        svg_hash = get_svg_store().put(get_latex_cache_key(ensure_complete_latex_document(content)), '<svg/>')
+        questions.append({'id': str(i), 'name': f'Q{i}', 'content': content, 'answer': str(i), 'rating': 1.0,
+                          'tags': [tag['id'] for tag in tags], 'deleted': False, 'attachments': [],
+                          'svg_hash': svg_hash, 'svg_generated': True})
+    for key, items in (('QUESTIONS_FILE', questions), ('TAGS_FILE', tags), ('QUIZZES_FILE', []), ('QUIZ_TAGS_FILE', [])):
+        with open(app.config[key], 'w') as f:
+            json.dump(items, f)
+    
+    # Make the shared JSON repository re-parse on every read, so each load of the tags store opens the file
+    real_signature, reads = repository.file_signature, itertools.count()
+    monkeypatch.setattr(repository, 'file_signature', lambda path: real_signature(path) and (real_signature(path), next(reads)))
+    opened = []
+    real_open = builtins.open
+    def counting_open(file, *args, **kwargs):
+        if file == app.config['TAGS_FILE']:
+            opened.append(file)
+        return real_open(file, *args, **kwargs)
+    monkeypatch.setattr(builtins, 'open', counting_open)
+    
+    response = app.test_client().get('/questionbank')
+    assert response.status_code == 200
+    assert response.get_data(as_text=True).count(f'Tag {TAG_COUNT - 1}') >= len(questions)
+    assert len(opened) == 1
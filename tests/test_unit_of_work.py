@@ -0,0 +1,32 @@
+from app.storage import JsonStorage, STORE_FILES
+from app.unit_of_work import UnitOfWork
+
+class CountingStorage(JsonStorage):
+    def __init__(self, config):
+        super().__init__(config)
+        self.loads = 0
+
+    def load_versioned(self, store):
+        self.loads += 1
+        return super().load_versioned(store)
+
+def make_storage(tmp_path):
+    storage = CountingStorage({key: str(tmp_path / f"{store}.json") for store, key in STORE_FILES.items()})
+    storage.upsert('tags', {'id': 'algebra', 'display_name': 'Algebra'})
+    return storage
+
+def test_store_is_loaded_once_and_reloaded_after_a_write(tmp_path):
+    storage = make_storage(tmp_path)
+    unit_of_work = UnitOfWork(storage)
+    version, tags = unit_of_work.load_versioned('tags')
+    tags[0]['display_name'] = 'Changed'  # callers get private copies
+    assert unit_of_work.get('tags', 'algebra')['display_name'] == 'Algebra'
+    assert unit_of_work.load('tags') == unit_of_work.load('tags')
+    assert storage.loads == 1
+    
+    unit_of_work.upsert('tags', {'id': 'calculus', 'display_name': 'Calculus'})
+    new_version, tags = unit_of_work.load_versioned('tags')
+    # The version and items come from the same read, after the write
+    assert (new_version, [tag['id'] for tag in tags]) == (storage.version('tags'), ['algebra', 'calculus'])
+    assert new_version != version
+    assert storage.loads == 2